@@ -0,0 +1 @@
+"""Benchmarks of the statement pipeline: parse, categorize, aggregate, render"""
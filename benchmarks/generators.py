@@ -0,0 +1,95 @@
+"""Synthetic bank statements of any size, in the format of each bank"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from statement.static.packages import statement_parser
+
+START_DATE = np.datetime64("2020-01-01")
+# Transactions per day of the generated statements
+ROWS_PER_DAY = 5
+
+HDFC_NARRATIONS = [
+    "UPI-SWIGGY-SWIGGY@ICICI-ICIC0001-3122",
+    "UPI-ZOMATO LTD-ZOMATO@HDFC-HDFC0001-5521",
+    "POS 4567XXXX AMAZON",
+    "ATW-512967XXXX-S1ANBG23-BANGALORE",
+    "IMPS-312-JOHN DOE-SBIN",
+    "ACH D- TP ACH ICICI BANK-123",
+    "CC 000 AUTOPAY SI-TAD",
+]
+HDFC_CREDIT_NARRATIONS = [
+    "NEFT CR-HDFC0000-ACME CORP PAYROLL",
+    "UPI-JANE DOE-JANE@OKAXIS-UTIB0001-7781",
+]
+ICICI_MODES = ["UPI", "NEFT", "ATM", "IMPS", "POS"]
+ICICI_PARTICULARS = ["SWIGGY/123/X", "SALARY ACME", "CASH WDL", "JOHN/998", "AMAZON"]
+
+
+def transactions(rows, seed):
+    """Dates, credit flags, amounts and closing balances of the transactions"""
+    rng = np.random.default_rng(seed)
+    dates = START_DATE + np.arange(rows) // ROWS_PER_DAY
+    credit = rng.random(rows) < 0.2
+    amounts = np.where(
+        credit, rng.uniform(1000, 50000, rows), rng.uniform(10, 5000, rows)
+    ).round(2)
+    balance = 100000.0 + np.cumsum(np.where(credit, amounts, -amounts))
+    return rng, pd.to_datetime(dates), credit, amounts, balance.round(2)
+
+
+def to_csv(header, statement_df):
+    """CSV bytes of the statement under the header line of the bank"""
+    statement_csv = io.StringIO()
+    statement_csv.write(header + "\n")
+    statement_df.to_csv(statement_csv, header=False, index=False, float_format="%.2f")
+    return statement_csv.getvalue().encode()
+
+
+def hdfc_statement(rows, seed=0):
+    """HDFC statement export with the given number of transactions"""
+    rng, dates, credit, amounts, balance = transactions(rows, seed)
+    narration = np.where(
+        credit,
+        rng.choice(HDFC_CREDIT_NARRATIONS, rows),
+        rng.choice(HDFC_NARRATIONS, rows),
+    )
+    dates = dates.strftime("%d/%m/%y")
+
+    statement_df = pd.DataFrame(
+        {
+            "Date": dates,
+            "Narration": narration,
+            "Value Dat": dates,
+            "Debit Amount": np.where(credit, 0.0, amounts),
+            "Credit Amount": np.where(credit, amounts, 0.0),
+            "Chq/Ref Number": rng.integers(10**11, 10**12, rows),
+            "Closing Balance": balance,
+        }
+    )
+    return to_csv(statement_parser.HDFC_HEADER, statement_df)
+
+
+def icici_statement(rows, seed=0):
+    """ICICI statement export with the given number of transactions"""
+    rng, dates, credit, amounts, balance = transactions(rows, seed)
+
+    statement_df = pd.DataFrame(
+        {
+            "DATE": dates.strftime("%d-%m-%Y"),
+            "MODE": rng.choice(ICICI_MODES, rows),
+            "PARTICULARS": rng.choice(ICICI_PARTICULARS, rows),
+            "DEPOSITS": np.where(credit, amounts, 0.0),
+            "WITHDRAWALS": np.where(credit, 0.0, amounts),
+            "BALANCE": balance,
+        }
+    )
+    return to_csv(statement_parser.ICICI_HEADER, statement_df)
+
+
+STATEMENT_GENERATORS = {
+    "HDFC": hdfc_statement,
+    "ICICI": icici_statement,
+}
@@ -0,0 +1,248 @@
+"""Time each stage of the statement pipeline and write the results as JSON
+
+Run from the project root:
+
+    python -m benchmarks.pipeline --sizes 1000 10000 --output benchmark.json
+
+Each stage is timed --repeat times on synthetic statements of every size and
+bank. Compare the JSON output of two commits to spot regressions.
+"""
+
+import io
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+import statistics
+
+import django
+from django.core.management import call_command
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "expense_tracker_app.settings")
+# The synthetic statements go to a scratch database, not the local one
+os.environ.setdefault(
+    "SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+)
+django.setup()
+call_command("migrate", verbosity=0)
+
+import pandas as pd  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.contrib.sessions.backends.signed_cookies import SessionStore  # noqa: E402
+
+from benchmarks import generators  # noqa: E402
+from benchmarks import report  # noqa: E402
+from statement import views  # noqa: E402
+from statement.static.packages import statement_cache  # noqa: E402
+from statement.static.packages import statement_parser  # noqa: E402
+from statement.static.packages import statement_store  # noqa: E402
+from statement.static.packages import transactions  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+REPEAT = 3
+
+# Filters of the statement table used for the filter path and rows request
+FILTERS = {
+    "start_date": "2020-03-01",
+    "end_date": "2021-12-31",
+    "category": "All",
+    "credit_or_debit": "Debit",
+    "search": "swiggy",
+}
+
+
+def timed(stage, bank, rows, repeat, run, setup=None):
+    """Time the run function, calling setup (untimed) before each run"""
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+
+    result = {
+        "stage": stage,
+        "bank": bank,
+        "rows": rows,
+        "repeat": repeat,
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.mean(durations),
+    }
+    print(
+        f"{stage:<30} {bank:<6} {rows:>9} rows  {result['median'] * 1000:10.2f} ms",
+        file=sys.stderr,
+    )
+    return result
+
+
+def memory(bank, rows, statement_df):
+    """Memory of the statement as parsed, normalized and serialized"""
+    normalized_df = statement_store.normalize_statement(statement_df.copy())
+    result = {
+        "stage": "memory",
+        "bank": bank,
+        "rows": rows,
+        "parsed": statement_store.memory_report(statement_df),
+        "normalized": statement_store.memory_report(normalized_df),
+        "blob_bytes": len(statement_store.dump_statement(normalized_df)),
+    }
+    print(
+        f"{'memory':<30} {bank:<6} {rows:>9} rows"
+        f"  parsed {result['parsed']['Total'] / 1024:9.1f} KB"
+        f"  normalized {result['normalized']['Total'] / 1024:9.1f} KB"
+        f"  blob {result['blob_bytes'] / 1024:9.1f} KB",
+        file=sys.stderr,
+    )
+    return result
+
+
+def clear_chart_caches():
+    """Drop the in-process caches, so charts and cubes are built again"""
+    statement_cache.CHART_CACHE.clear()
+    statement_cache.LOCAL_CACHE.clear()
+
+
+def session_client(session_id):
+    """Test client whose session uses the given statement namespace"""
+    session = SessionStore()
+    session[views.SESSION_NAMESPACE] = session_id
+    session.save()
+
+    client = Client()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+    return client
+
+
+def benchmark_statement(bank, rows, repeat):
+    """Time every stage of the pipeline on one synthetic statement"""
+    statement_data = generators.STATEMENT_GENERATORS[bank](rows)
+    session_id = uuid.uuid4().hex
+    namespace = f"session-{session_id}"
+    results = []
+
+    def parse():
+        return statement_parser.parse_statement(bank, io.BytesIO(statement_data))
+
+    results.append(timed("parse_statement", bank, rows, repeat, parse))
+    statement_df = parse()
+
+    results.append(
+        timed(
+            "add_category",
+            bank,
+            rows,
+            repeat,
+            lambda: views.add_category(statement_df),
+        )
+    )
+    results.append(memory(bank, rows, views.add_category(statement_df.copy())))
+    results.append(
+        timed(
+            "save_statement",
+            bank,
+            rows,
+            repeat,
+            lambda: statement_cache.save_statement(
+                namespace, "statement.csv", statement_df
+            ),
+        )
+    )
+
+    results.append(
+        timed(
+            "monthly_cube",
+            bank,
+            rows,
+            repeat,
+            lambda: transactions.monthly_cube(namespace),
+        )
+    )
+
+    cube = statement_cache.load_cube(namespace)
+    month = views.cube_month_labels(cube)[-1]
+    # As the dashboard does, the chart key is computed before the charts and
+    # plotly is warmed up once, outside the timed runs
+    content_hash = statement_cache.charts_hash(namespace)
+    views.load_plotly()
+    results.append(
+        timed(
+            "statement_as_bar",
+            bank,
+            rows,
+            repeat,
+            lambda: views.statement_as_bar(content_hash, cube),
+            setup=clear_chart_caches,
+        )
+    )
+    results.append(
+        timed(
+            "statement_as_pichart",
+            bank,
+            rows,
+            repeat,
+            lambda: views.statement_as_pichart(
+                content_hash, cube, month, True, "Debit"
+            ),
+            setup=clear_chart_caches,
+        )
+    )
+
+    def filter_page():
+        queryset = transactions.filter_transactions(namespace, FILTERS)
+        columns = views.statement_columns(FILTERS)
+        return queryset.count(), transactions.transactions_frame(
+            queryset[: views.STATEMENT_PAGE_SIZE], columns
+        )
+
+    results.append(timed("filter_transactions", bank, rows, repeat, filter_page))
+
+    client = session_client(session_id)
+    for stage, path, query, setup in [
+        ("request / (cold)", "/", {}, clear_chart_caches),
+        ("request / (warm)", "/", {}, None),
+        ("request /bank-statement/", "/bank-statement/", {}, None),
+        ("request /bank-statement/rows/", "/bank-statement/rows/", FILTERS, None),
+    ]:
+        results.append(
+            timed(
+                stage,
+                bank,
+                rows,
+                repeat,
+                lambda: client.get(path, query),
+                setup=setup,
+            )
+        )
+
+    statement_cache.delete_statement(namespace, "statement.csv")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument(
+        "--banks",
+        nargs="+",
+        default=list(generators.STATEMENT_GENERATORS),
+        choices=list(generators.STATEMENT_GENERATORS),
+    )
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", help="JSON file of the results, else stdout")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.sizes:
+        for bank in args.banks:
+            results.extend(benchmark_statement(bank, rows, args.repeat))
+
+    report.write_report(results, args.output, pandas=pd.__version__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""JSON reports of the benchmark results"""
+
+import json
+import time
+import platform
+import subprocess
+
+
+def git_commit():
+    """Commit of the benchmarked tree, None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(results, output=None, **details):
+    """Write the results with the commit and environment, to stdout by default"""
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        **details,
+        "results": results,
+    }
+    report_json = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as report_file:
+            report_file.write(report_json + "\n")
+    else:
+        print(report_json)
@@ -0,0 +1,112 @@
+"""Time cold starts: URLconf import and first request of each page, with RSS
+
+Run from the project root:
+
+    python -m benchmarks.startup --repeat 5 --output startup.json
+
+Each sample runs in a fresh interpreter, as a serverless cold start does. The
+report also lists which heavy libraries the page loaded.
+"""
+
+import os
+import sys
+import json
+import time
+import types
+import argparse
+import resource
+import statistics
+import subprocess
+
+from benchmarks import report
+
+PATHS = ["/help/", "/", "/upload/", "/metrics/"]
+REPEAT = 5
+HEAVY_MODULES = ["numpy", "pandas", "plotly"]
+
+
+def cold_start(path):
+    """Start Django and serve the first request, in the current interpreter"""
+    start = time.perf_counter()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "expense_tracker_app.settings")
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.test import Client
+    from django.urls import get_resolver
+
+    get_resolver(settings.ROOT_URLCONF).url_patterns
+    imported = time.perf_counter()
+
+    status = Client().get(path).status_code
+    served = time.perf_counter()
+
+    return {
+        "path": path,
+        "status": status,
+        "import_seconds": imported - start,
+        "first_request_seconds": served - imported,
+        # Kilobytes on Linux
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        # Lazily imported modules keep their lazy type until they are used
+        "loaded_modules": [
+            name
+            for name in HEAVY_MODULES
+            if type(sys.modules.get(name)) is types.ModuleType
+        ],
+    }
+
+
+def sample(path):
+    """Cold start of the path in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", path],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def benchmark_path(path, repeat):
+    """Median cold start of the path over the repeated samples"""
+    samples = [sample(path) for _ in range(repeat)]
+    result = {
+        "path": path,
+        "status": samples[0]["status"],
+        "repeat": repeat,
+        "loaded_modules": samples[0]["loaded_modules"],
+    }
+    for metric in ["import_seconds", "first_request_seconds", "max_rss_kb"]:
+        result[metric] = statistics.median(s[metric] for s in samples)
+
+    print(
+        f"{path:<16} import {result['import_seconds'] * 1000:8.1f} ms"
+        f"  request {result['first_request_seconds'] * 1000:8.1f} ms"
+        f"  rss {result['max_rss_kb'] / 1024:7.1f} MB"
+        f"  loaded {', '.join(result['loaded_modules']) or '-'}",
+        file=sys.stderr,
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paths", nargs="+", default=PATHS)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", help="JSON file of the results, else stdout")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(cold_start(args.child)))
+        return
+
+    report.write_report(
+        [benchmark_path(path, args.repeat) for path in args.paths], args.output
+    )
+
+
+if __name__ == "__main__":
+    main()
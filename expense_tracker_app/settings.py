@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
 import os
+import importlib.util
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "statement.middleware.ServerTimingMiddleware",
+    "statement.middleware.CacheVersionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -79,7 +82,15 @@ WSGI_APPLICATION = "expense_tracker_app.wsgi.app"
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {}
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+        # Seconds a write waits for the database lock, held by each upload or
+        # delete while it updates a ledger
+        "OPTIONS": {"timeout": 20},
+    }
+}
 
 
 # Password validation
@@ -122,9 +133,16 @@ MEDIA_URL = "/media/"
 
 MEDIA_ROOT = BASE_DIR / "media"
 
+# plotly.js is served from the plotly package as /static/plotly/plotly.min.js
+PLOTLY_PACKAGE_DATA = (
+    Path(importlib.util.find_spec("plotly").submodule_search_locations[0])
+    / "package_data"
+)
+
 STATICFILES_DIRS = [
     BASE_DIR / "static",
     BASE_DIR / "statement" / "static",
+    ("plotly", PLOTLY_PACKAGE_DATA),
 ]
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -132,10 +150,61 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
-        "LOCATION": "/tmp",
-        "OPTIONS": {"MAX_ENTRIES": 1000},
+# Shared by all the workers: Redis when REDIS_URL is set (needs the redis
+# package), else the file based cache as a local stand-in
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
     }
-}
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": "/tmp",
+            "OPTIONS": {"MAX_ENTRIES": 1000},
+        }
+    }
+
+# Sessions only carry the statement namespace, no database needed
+SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+
+# Largest bank statement accepted on upload, in bytes
+STATEMENT_MAX_UPLOAD_SIZE = 500 * 1024
+# Statements accepted in one upload, as many files or a zip archive
+STATEMENT_MAX_FILES = 24
+# Bytes of all the statements of one upload together, zips decompressed
+STATEMENT_MAX_TOTAL_SIZE = 5 * 1024 * 1024
+
+# Transactions read from the database at a time by the streaming exports
+EXPORT_CHUNK_ROWS = 5000
+
+# Rendered chart fragments kept in memory by each worker
+CHART_CACHE_MAX_ENTRIES = 128
+
+# Manifests and cubes kept in memory by each worker, in front of the shared
+# cache
+LOCAL_CACHE_MAX_ENTRIES = 64
+
+# Processes parsing the uploaded statements in the background, 0 processes the
+# uploads inside the request (serverless deployments have no background work)
+STATEMENT_UPLOAD_WORKERS = int(os.environ.get("STATEMENT_UPLOAD_WORKERS", 2))
+
+# Fraction of the requests profiled with cProfile, and the X-Profile-Request
+# header value that flags one request for profiling (unset disables flagging)
+REQUEST_PROFILE_SAMPLE_RATE = float(os.environ.get("REQUEST_PROFILE_SAMPLE_RATE", 0))
+REQUEST_PROFILE_TOKEN = os.environ.get("REQUEST_PROFILE_TOKEN")
+REQUEST_PROFILE_DIR = os.environ.get("REQUEST_PROFILE_DIR", "/tmp/request_profiles")
+
+# Each process flushes its metrics to its own file in METRICS_DIR, summed by
+# the metrics endpoint
+METRICS_DIR = os.environ.get("METRICS_DIR", "/tmp/expense_tracker_metrics")
+METRICS_FLUSH_INTERVAL = 5
+
+# Identifies the deployed code in the ETags of the pages, so a deploy does not
+# answer 304 with pages rendered by the previous templates
+RELEASE_VERSION = os.environ.get(
+    "RELEASE_VERSION", os.environ.get("VERCEL_GIT_COMMIT_SHA", "")
+)
@@ -14,4 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "expense_tracker_app.settings")
 
 application = get_wsgi_application()
+
+if os.environ.get("MIGRATE_ON_STARTUP"):
+    # Serverless instances start with an empty database
+    from django.core.management import call_command
+
+    call_command("migrate", interactive=False, verbosity=0)
+
 app = application
@@ -2,5 +2,5 @@ from django.apps import AppConfig
 
 
 class StatementConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'statement'
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "statement"
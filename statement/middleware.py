@@ -0,0 +1,127 @@
+"""Middleware for Statement"""
+
+import os
+import re
+import time
+import random
+import cProfile
+
+from asgiref.sync import iscoroutinefunction
+from asgiref.sync import markcoroutinefunction
+
+from statement.static.packages import metrics
+from statement.static.packages import stage_timing
+from statement.static.packages import statement_cache
+from expense_tracker_app.settings import REQUEST_PROFILE_DIR
+from expense_tracker_app.settings import REQUEST_PROFILE_SAMPLE_RATE
+from expense_tracker_app.settings import REQUEST_PROFILE_TOKEN
+
+PROFILE_HEADER = "X-Profile-Request"
+
+
+class ServerTimingMiddleware:
+    """Report the stage timings of each request in the Server-Timing header
+
+    The latency of each request is also recorded in the metrics, by view.
+
+    Sampled requests, and requests flagged with the X-Profile-Request header
+    set to REQUEST_PROFILE_TOKEN, are also profiled with cProfile and the
+    stats dumped to REQUEST_PROFILE_DIR.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = stage_timing.start_request()
+        profile = self.start_profile(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        return self.finish(request, response, token, profile, start)
+
+    async def __acall__(self, request):
+        token = stage_timing.start_request()
+        profile = self.start_profile(request)
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.finish(request, response, token, profile, start)
+
+    def start_profile(self, request):
+        """Profiler of the request if it is sampled or flagged, else None"""
+        flagged = REQUEST_PROFILE_TOKEN and (
+            request.headers.get(PROFILE_HEADER) == REQUEST_PROFILE_TOKEN
+        )
+        if not flagged and random.random() >= REQUEST_PROFILE_SAMPLE_RATE:
+            return None
+
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, request, response, token, profile, start):
+        """Add the Server-Timing header and dump the profile if any"""
+        total = time.perf_counter() - start
+        timings = stage_timing.end_request(token)
+        timings["total"] = total
+        response["Server-Timing"] = ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()
+        )
+        if request.resolver_match is not None:
+            metrics.observe(
+                "statement_request_seconds",
+                total,
+                {"view": request.resolver_match.url_name},
+            )
+
+        if profile is not None:
+            profile.disable()
+            os.makedirs(REQUEST_PROFILE_DIR, exist_ok=True)
+            path = re.sub(r"[^\w]+", "-", request.path).strip("-") or "root"
+            profile.dump_stats(
+                os.path.join(
+                    REQUEST_PROFILE_DIR,
+                    f"{time.strftime('%Y%m%d-%H%M%S')}-{path}-{total * 1000:.0f}ms.prof",
+                )
+            )
+        return response
+
+
+class CacheVersionMiddleware:
+    """Read the version stamp of each namespace once per request
+
+    The charts, cube and manifest of a request are then all checked against
+    the same stamp, instead of asking the shared cache on every lookup.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = statement_cache.start_request()
+        try:
+            return self.get_response(request)
+        finally:
+            statement_cache.end_request(token)
+
+    async def __acall__(self, request):
+        token = statement_cache.start_request()
+        try:
+            return await self.get_response(request)
+        finally:
+            statement_cache.end_request(token)
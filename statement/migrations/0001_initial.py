@@ -0,0 +1,84 @@
+# Generated by Django 4.2 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Statement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("owner", models.CharField(max_length=64)),
+                ("name", models.CharField(max_length=255)),
+                ("content_hash", models.CharField(max_length=40)),
+                ("rows", models.PositiveIntegerField()),
+                ("uploaded", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Transaction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("owner", models.CharField(max_length=64)),
+                ("row_hash", models.BigIntegerField()),
+                ("date", models.DateField()),
+                ("narration", models.TextField(blank=True)),
+                ("value_date", models.CharField(blank=True, max_length=16)),
+                ("debit", models.FloatField(null=True)),
+                ("credit", models.FloatField(null=True)),
+                ("ref_number", models.CharField(blank=True, max_length=32)),
+                ("closing_balance", models.FloatField(null=True)),
+                ("mode", models.CharField(blank=True, max_length=64)),
+                ("category", models.CharField(blank=True, max_length=64)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["owner", "date"], name="owner_date"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["owner", "category"], name="owner_category"),
+        ),
+        migrations.AddConstraint(
+            model_name="transaction",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "row_hash"), name="unique_owner_row_hash"
+            ),
+        ),
+        migrations.AddField(
+            model_name="statement",
+            name="transactions",
+            field=models.ManyToManyField(
+                related_name="statements", to="statement.transaction"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="statement",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "name"), name="unique_owner_name"
+            ),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2 on 2026-10-18 20:11
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncMonth
+
+DIRECTIONS = {"Debit": "debit", "Credit": "credit"}
+
+
+def summarize_ledgers(apps, schema_editor):
+    """Fill the summaries of the statements uploaded before them"""
+    Statement = apps.get_model("statement", "Statement")
+    Transaction = apps.get_model("statement", "Transaction")
+    MonthlySummary = apps.get_model("statement", "MonthlySummary")
+
+    for statement in Statement.objects.all():
+        statement.first_date, statement.last_date = statement.transactions.aggregate(
+            first_date=Min("date"), last_date=Max("date")
+        ).values()
+        statement.save(update_fields=["first_date", "last_date"])
+
+    for direction, field in DIRECTIONS.items():
+        MonthlySummary.objects.bulk_create(
+            MonthlySummary(direction=direction, **record)
+            for record in (
+                Transaction.objects.filter(**{f"{field}__isnull": False})
+                .exclude(**{field: 0.0})
+                .values("owner", "mode", "category", month=TruncMonth("date"))
+                .annotate(amount=Sum(field), count=Count("id"))
+                .order_by()
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("statement", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("owner", models.CharField(max_length=64)),
+                ("month", models.DateField()),
+                ("direction", models.CharField(max_length=8)),
+                ("mode", models.CharField(blank=True, max_length=64)),
+                ("category", models.CharField(blank=True, max_length=64)),
+                ("amount", models.FloatField()),
+                ("count", models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="statement",
+            name="first_date",
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name="statement",
+            name="last_date",
+            field=models.DateField(null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="monthlysummary",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "month", "direction", "mode", "category"),
+                name="unique_owner_summary",
+            ),
+        ),
+        migrations.RunPython(summarize_ledgers, migrations.RunPython.noop),
+    ]
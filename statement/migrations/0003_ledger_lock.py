@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("statement", "0002_monthly_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerLock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("owner", models.CharField(max_length=64, unique=True)),
+                ("locked", models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -1,3 +1,101 @@
-"""Models for statement """
+"""Models for statement"""
 
 from django.db import models
+
+
+class Transaction(models.Model):
+    """One transaction of the merged ledger of an owner
+
+    A transaction found in several uploaded statements is stored once, linked
+    to each of them, and removed with the last of them.
+    """
+
+    # Statement namespace: "user-<pk>" or "session-<uuid>"
+    owner = models.CharField(max_length=64)
+    # Hash of the dedupe columns, signed to fit an SQLite integer
+    row_hash = models.BigIntegerField()
+    date = models.DateField()
+    narration = models.TextField(blank=True)
+    value_date = models.CharField(max_length=16, blank=True)
+    debit = models.FloatField(null=True)
+    credit = models.FloatField(null=True)
+    ref_number = models.CharField(max_length=32, blank=True)
+    closing_balance = models.FloatField(null=True)
+    mode = models.CharField(max_length=64, blank=True)
+    category = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "row_hash"], name="unique_owner_row_hash"
+            )
+        ]
+        indexes = [
+            models.Index(fields=["owner", "date"], name="owner_date"),
+            models.Index(fields=["owner", "category"], name="owner_category"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.narration}"
+
+
+class Statement(models.Model):
+    """One uploaded statement file of an owner"""
+
+    owner = models.CharField(max_length=64)
+    name = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=40)
+    rows = models.PositiveIntegerField()
+    first_date = models.DateField(null=True)
+    last_date = models.DateField(null=True)
+    uploaded = models.DateTimeField(auto_now=True)
+    transactions = models.ManyToManyField(Transaction, related_name="statements")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "name"], name="unique_owner_name")
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class MonthlySummary(models.Model):
+    """Totals of the ledger of an owner by month, direction and category
+
+    Kept up to date with the transactions each upload adds and each delete
+    removes, so the dashboard never sums the whole ledger.
+    """
+
+    owner = models.CharField(max_length=64)
+    month = models.DateField()
+    direction = models.CharField(max_length=8)
+    mode = models.CharField(max_length=64, blank=True)
+    category = models.CharField(max_length=64, blank=True)
+    amount = models.FloatField()
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "month", "direction", "mode", "category"],
+                name="unique_owner_summary",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.month:%b %Y} {self.direction} {self.category}"
+
+
+class LedgerLock(models.Model):
+    """Row of an owner locked by each update of their ledger
+
+    Uploads and deletes take it first in their database transaction, so the
+    updates of one ledger run one at a time in every worker.
+    """
+
+    owner = models.CharField(max_length=64, unique=True)
+    locked = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return self.owner
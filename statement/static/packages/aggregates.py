@@ -0,0 +1,82 @@
+"""Monthly aggregate cube of the statement transactions"""
+
+from statement.static.packages import stage_timing
+from statement.static.packages.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+CUBE_LEVELS = ["Month", "Direction", "Mode", "Category Inner"]
+DIRECTIONS = {
+    "Debit": "Debit Amount",
+    "Credit": "Credit Amount",
+}
+MONTH_FORMAT = "%b %Y"
+
+
+def empty_cube():
+    """Cube with no transactions"""
+    index = pd.MultiIndex.from_arrays(
+        [pd.PeriodIndex([], freq="M"), [], [], []], names=CUBE_LEVELS
+    )
+    return pd.DataFrame({"Amount": [], "Count": []}, index=index)
+
+
+@stage_timing.stage("resample")
+def cube_from_records(records):
+    """Cube of the {"month", "direction", "mode", "category", "amount", "count"}
+    records summed by the database"""
+    rows = pd.DataFrame.from_records(list(records))
+    if rows.empty:
+        return empty_cube()
+
+    cube = pd.DataFrame(
+        {
+            "Month": pd.PeriodIndex(pd.to_datetime(rows["month"]), freq="M"),
+            "Direction": rows["direction"],
+            "Mode": rows["mode"],
+            "Category Inner": rows["category"],
+            "Amount": rows["amount"].astype("float64"),
+            "Count": rows["count"].astype("int64"),
+        }
+    ).set_index(CUBE_LEVELS)
+    return cube.sort_index()
+
+
+def cube_months(cube):
+    """All the months between the first and the last transaction"""
+    if cube.empty:
+        return pd.PeriodIndex([], freq="M")
+    months = cube.index.get_level_values("Month")
+    return pd.period_range(months.min(), months.max(), freq="M")
+
+
+def month_label(month):
+    """Label of the month as shown on the dashboard"""
+    return month.strftime(MONTH_FORMAT)
+
+
+def parse_month(label):
+    """Month from its dashboard label, None if it is not a valid label"""
+    try:
+        return pd.Period(pd.to_datetime(label, format=MONTH_FORMAT), freq="M")
+    except (TypeError, ValueError):
+        return None
+
+
+@stage_timing.stage("resample")
+def monthly_totals(cube, direction, months):
+    """Total amount of each month for the direction"""
+    if direction not in cube.index.get_level_values("Direction"):
+        return pd.Series(0.0, index=months)
+    totals = (
+        cube.xs(direction, level="Direction")["Amount"].groupby(level="Month").sum()
+    )
+    return totals.reindex(months, fill_value=0.0)
+
+
+def month_slice(cube, month, direction):
+    """Categories of one month and direction, looked up on the sorted index"""
+    try:
+        return cube.loc[(month, direction)]
+    except KeyError:
+        return cube.iloc[0:0].droplevel(["Month", "Direction"])
@@ -0,0 +1,31 @@
+"""Categorize the statement transactions from their narration"""
+
+import re
+
+from statement.static.packages import stage_timing
+
+# Mode is the narration up to the first space, "-" or "/"
+MODE_PATTERN = re.compile(r"^([^ \-/]*)")
+# Category is the first word, cut to its first two "-" separated parts
+CATEGORY_PATTERN = re.compile(r"^([^-]*)-([^-]*)")
+CATEGORY_DETAIL_LENGTH = 15
+
+
+@stage_timing.stage("categorize")
+def categorize(statement_df):
+    """Add the Mode and Category Inner columns for the whole statement at once"""
+    narration = statement_df["Narration"].fillna("").astype(str)
+
+    mode = narration.str.extract(MODE_PATTERN, expand=False)
+
+    first_word = narration.str.split(n=1).str[0].fillna("")
+    parts = first_word.str.extract(CATEGORY_PATTERN)
+    category = first_word.where(
+        parts[1].isna(),
+        parts[0] + "-" + parts[1].str[:CATEGORY_DETAIL_LENGTH],
+    )
+
+    statement_df["Mode"] = mode.astype("category")
+    statement_df["Category Inner"] = category.astype("category")
+
+    return statement_df
@@ -0,0 +1,150 @@
+"""Streaming exports of the statement data as CSV, Parquet or XLSX
+
+Rows are read from the database in chunks of EXPORT_CHUNK_ROWS and each
+chunk is written out before the next one is read, so an export never holds
+the whole file in memory. Parquet needs the pyarrow package and XLSX the
+xlsxwriter package, the formats are only offered when they are installed.
+"""
+
+import io
+import csv
+import tempfile
+import itertools
+import importlib.util
+
+from expense_tracker_app.settings import EXPORT_CHUNK_ROWS
+
+# Bytes read at a time from the XLSX file built on disk
+FILE_CHUNK_SIZE = 64 * 1024
+XLSX_DATE_FORMAT = "yyyy-mm-dd"
+
+
+def row_chunks(rows):
+    """Lists of EXPORT_CHUNK_ROWS rows of the values_list queryset, or of the
+    list of rows"""
+    if hasattr(rows, "iterator"):
+        rows = rows.iterator(chunk_size=EXPORT_CHUNK_ROWS)
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, EXPORT_CHUNK_ROWS)):
+        yield chunk
+
+
+class ChunkBuffer:
+    """Write-only binary file whose written bytes are taken by the stream"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        """Bytes written since the last take"""
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def csv_stream(columns, rows):
+    """CSV file of the rows, one chunk of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for chunk in row_chunks(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def parquet_stream(columns, rows):
+    """Parquet file of the rows, one row group per chunk of rows"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"date": pa.date32(), "float": pa.float64(), "int": pa.int64()}
+    schema = pa.schema([(name, types.get(kind, pa.string())) for name, kind in columns])
+
+    buffer = ChunkBuffer()
+    with pq.ParquetWriter(buffer, schema) as writer:
+        for chunk in row_chunks(rows):
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [
+                        pa.array(values, type=field.type)
+                        for values, field in zip(zip(*chunk), schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            yield buffer.take()
+    yield buffer.take()
+
+
+def xlsx_stream(columns, rows):
+    """XLSX file of the rows
+
+    An XLSX file is a zip archive that can only be written once its sheet is
+    complete, so the sheet is written row by row to a temporary file on disk
+    (xlsxwriter's constant memory mode), which is then streamed.
+    """
+    import xlsxwriter
+
+    with tempfile.TemporaryFile() as output:
+        workbook = xlsxwriter.Workbook(
+            output,
+            {"constant_memory": True, "default_date_format": XLSX_DATE_FORMAT},
+        )
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, [name for name, _ in columns])
+        row_number = 1
+        for chunk in row_chunks(rows):
+            for row in chunk:
+                worksheet.write_row(row_number, 0, row)
+                row_number += 1
+        workbook.close()
+
+        output.seek(0)
+        while data := output.read(FILE_CHUNK_SIZE):
+            yield data
+
+
+# Format -> (content type, stream, required package)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", csv_stream, None),
+    "parquet": ("application/vnd.apache.parquet", parquet_stream, "pyarrow"),
+    "xlsx": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        xlsx_stream,
+        "xlsxwriter",
+    ),
+}
+
+
+def available_formats():
+    """Export formats whose required package is installed"""
+    return [
+        export_format
+        for export_format, (_, _, package) in EXPORT_FORMATS.items()
+        if package is None or importlib.util.find_spec(package) is not None
+    ]
+
+
+def export(export_format, columns, rows):
+    """Content type and byte chunks of the [(name, kind)] columns of the rows"""
+    content_type, stream, _ = EXPORT_FORMATS[export_format]
+    return content_type, stream(columns, rows)
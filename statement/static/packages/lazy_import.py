@@ -0,0 +1,26 @@
+"""Modules executed on first use, to keep serverless cold starts light"""
+
+import sys
+import importlib.util
+
+
+def lazy_import(name):
+    """Import the module, deferring its execution until an attribute is used
+
+    The first attribute access is not thread safe before Python 3.12: use the
+    module once before sharing it with worker threads.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,31 @@
+"""Transactions found in several uploaded statements, matched by their hashes"""
+
+from statement.static.packages.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+# A transaction is the same in two statements if these columns match
+DEDUPE_COLUMNS = [
+    "Date",
+    "Debit Amount",
+    "Credit Amount",
+    "Chq/Ref Number",
+    "Closing Balance",
+]
+REF_COLUMN = "Chq/Ref Number"
+
+
+def row_hashes(statement_df):
+    """Hash of the dedupe columns of each transaction"""
+    # Refs are hashed as text, whatever dtype the statement was read with
+    refs = statement_df[REF_COLUMN].astype(object).fillna("").astype(str).str.strip()
+    return pd.util.hash_pandas_object(
+        statement_df[DEDUPE_COLUMNS].assign(**{REF_COLUMN: refs}), index=False
+    ).to_numpy()
+
+
+def unique_rows(statement_df):
+    """Transactions of the statement with their hashes, without duplicates"""
+    hashes = row_hashes(statement_df)
+    unique = ~pd.Index(hashes).duplicated()
+    return statement_df[unique], hashes[unique]
@@ -0,0 +1,309 @@
+"""In-process metrics, aggregated across workers in Prometheus text format
+
+Each process counts in memory and flushes its values to its own JSON file in
+METRICS_DIR, at most every METRICS_FLUSH_INTERVAL seconds. The metrics
+endpoint sums the files of all the processes (gunicorn workers and upload
+workers alike). The files of processes that have exited are folded into a
+retired totals file and removed, so they neither pile up nor get overwritten
+by a new process that reuses the pid.
+"""
+
+import os
+import json
+import glob
+import fcntl
+import atexit
+import bisect
+import tempfile
+import threading
+import contextlib
+
+from expense_tracker_app.settings import METRICS_DIR
+from expense_tracker_app.settings import METRICS_FLUSH_INTERVAL
+
+# Totals of the processes that have exited, and the lock guarding them
+RETIRED_FILE = "metrics-retired.json"
+RETIRED_LOCK_FILE = "metrics-retired.lock"
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+SIZE_BUCKETS = [10e3, 50e3, 100e3, 250e3, 500e3, 1e6, 5e6]
+
+# Metric name -> (type, help, histogram buckets)
+METRICS = {
+    "statement_cache_lookups_total": (
+        "counter",
+        "Cache lookups of statement and chart entries, by tier and result",
+        None,
+    ),
+    "statement_parse_rows_total": (
+        "counter",
+        "Transactions parsed, by bank parser",
+        None,
+    ),
+    "statement_parse_seconds_total": (
+        "counter",
+        "Seconds spent parsing statements, by bank parser",
+        None,
+    ),
+    "statement_upload_bytes": (
+        "histogram",
+        "Size of the uploaded statements",
+        SIZE_BUCKETS,
+    ),
+    "statement_memory_bytes": (
+        "histogram",
+        "Memory of the prepared statements, as a DF and as the stored blob",
+        SIZE_BUCKETS,
+    ),
+    "statement_request_seconds": (
+        "histogram",
+        "Latency of the requests, by view",
+        LATENCY_BUCKETS,
+    ),
+}
+
+
+class Registry:
+    """Metric values of one process"""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.counters = {}
+        self.histograms = {}
+        self.flush_timer = None
+        self.flushed = False
+        self.lock = threading.Lock()
+        # Held while flushing, so flushes write their values in order
+        self.flush_lock = threading.Lock()
+
+
+_registry = Registry()
+_registry_lock = threading.Lock()
+
+
+def registry():
+    """Registry of the current process, reset in forked children"""
+    global _registry
+    if _registry.pid != os.getpid():
+        with _registry_lock:
+            if _registry.pid != os.getpid():
+                _registry = Registry()
+    return _registry
+
+
+def series_key(name, labels):
+    """Hashable key of one series of the metric"""
+    return (name, tuple(sorted((labels or {}).items())))
+
+
+def inc(name, labels=None, value=1):
+    """Add the value to the counter"""
+    current = registry()
+    key = series_key(name, labels)
+    with current.lock:
+        current.counters[key] = current.counters.get(key, 0) + value
+        schedule_flush(current)
+
+
+def observe(name, value, labels=None):
+    """Record the value in the histogram"""
+    buckets = METRICS[name][2]
+    current = registry()
+    key = series_key(name, labels)
+    with current.lock:
+        counts, total, count = current.histograms.get(
+            key, ([0] * (len(buckets) + 1), 0.0, 0)
+        )
+        counts[bisect.bisect_left(buckets, value)] += 1
+        current.histograms[key] = (counts, total + value, count + 1)
+        schedule_flush(current)
+
+
+def schedule_flush(current):
+    """Flush the registry soon, the registry lock must be held"""
+    if current.flush_timer is None:
+        current.flush_timer = threading.Timer(
+            METRICS_FLUSH_INTERVAL, flush, args=(current,)
+        )
+        current.flush_timer.daemon = True
+        current.flush_timer.start()
+
+
+def metrics_file(pid):
+    """File of the flushed metrics of the process"""
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+def process_alive(pid):
+    """Whether the process is still running on this host"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_values(path):
+    """Flushed metrics of the file, None if it is missing or unreadable"""
+    try:
+        with open(path) as metrics_json:
+            return json.load(metrics_json)
+    except (OSError, ValueError):
+        return None
+
+
+def write_values(path, values):
+    """Replace the metrics file at once, so readers never see it half written"""
+    descriptor, temporary_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(descriptor, "w") as metrics_json:
+            json.dump(values, metrics_json)
+        os.replace(temporary_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary_path)
+        raise
+
+
+def merge_values(counters, histograms, values):
+    """Add the flushed metrics to the counters and histograms"""
+    for name, labels, value in values["counters"]:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, counts, total, count in values["histograms"]:
+        key = (name, tuple(map(tuple, labels)))
+        merged_counts, merged_total, merged_count = histograms.get(
+            key, ([0] * len(counts), 0.0, 0)
+        )
+        histograms[key] = (
+            [a + b for a, b in zip(merged_counts, counts)],
+            merged_total + total,
+            merged_count + count,
+        )
+
+
+def dump_values(counters, histograms):
+    """JSON form of the counters and histograms, as flushed to the files"""
+    return {
+        "counters": [
+            [name, labels, value] for (name, labels), value in counters.items()
+        ],
+        "histograms": [
+            [name, labels, counts, total, count]
+            for (name, labels), (counts, total, count) in histograms.items()
+        ],
+    }
+
+
+@contextlib.contextmanager
+def retired_lock():
+    """Hold the lock of the retired totals, across processes"""
+    with open(os.path.join(METRICS_DIR, RETIRED_LOCK_FILE), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def retire(pid):
+    """Fold the metrics file of the exited process into the retired totals"""
+    path = metrics_file(pid)
+    retired_path = os.path.join(METRICS_DIR, RETIRED_FILE)
+    with retired_lock():
+        values = read_values(path)
+        # Another process may have retired it already
+        if values is None:
+            return
+
+        counters, histograms = {}, {}
+        for retired_values in (read_values(retired_path), values):
+            if retired_values is not None:
+                merge_values(counters, histograms, retired_values)
+        write_values(retired_path, dump_values(counters, histograms))
+        os.remove(path)
+
+
+def flush(current=None):
+    """Write the metrics of the process to its file"""
+    current = current or registry()
+    with current.flush_lock:
+        with current.lock:
+            current.flush_timer = None
+            values = dump_values(current.counters, current.histograms)
+
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = metrics_file(current.pid)
+        if not current.flushed:
+            # A file already there belongs to an exited process with our pid
+            if os.path.exists(path):
+                retire(current.pid)
+            current.flushed = True
+
+        write_values(path, values)
+
+
+def collect():
+    """Sum of the flushed metrics of all the processes, retiring the exited"""
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        pid = os.path.basename(path)[len("metrics-") : -len(".json")]
+        if pid.isdigit() and not process_alive(int(pid)):
+            retire(int(pid))
+
+    counters = {}
+    histograms = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        values = read_values(path)
+        if values is not None:
+            merge_values(counters, histograms, values)
+
+    return counters, histograms
+
+
+def format_labels(labels, **extra):
+    """Prometheus label set of the series"""
+    labels = [*labels, *extra.items()]
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+def render():
+    """All the metrics in the Prometheus text exposition format"""
+    flush()
+    counters, histograms = collect()
+
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for (series, labels), value in sorted(counters.items()):
+            if series == name:
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        for (series, labels), (counts, total, count) in sorted(histograms.items()):
+            if series != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip([*buckets, "+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{name}_bucket{format_labels(labels, le=bound)} {cumulative}"
+                )
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+
+    return "\n".join(lines) + "\n"
+
+
+def flush_at_exit():
+    """Flush the last values of the process before it exits"""
+    current = registry()
+    if current.counters or current.histograms:
+        flush(current)
+
+
+atexit.register(flush_at_exit)
@@ -0,0 +1,40 @@
+"""Durations of the stages of the current request, for Server-Timing"""
+
+import time
+import contextlib
+import contextvars
+
+# (stage, seconds) list of the current request, None outside a timed request
+_stage_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+def start_request():
+    """Start collecting the stage timings of the request"""
+    return _stage_timings.set([])
+
+
+def end_request(token):
+    """Stop collecting and return the total seconds of each stage"""
+    timings = _stage_timings.get()
+    _stage_timings.reset(token)
+
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return totals
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the block as a stage of the current request"""
+    timings = _stage_timings.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        # Appending is atomic, so stages of concurrent threads can share the list
+        timings.append((name, time.perf_counter() - start))
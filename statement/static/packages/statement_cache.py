@@ -0,0 +1,250 @@
+"""Statements of each user, stored in the database and cached by namespace
+
+Transactions are stored in the database. The aggregate cube derived from them
+lives in the shared Django cache, and it and the manifest are also kept in an
+in-process LRU. A version stamp, changed in the shared cache on every upload
+or delete, keys the shared cube and tells each worker when its local copies
+are stale. Objects from
+the local cache are shared between requests: treat them as read only.
+"""
+
+import uuid
+import hashlib
+import logging
+import contextlib
+import contextvars
+
+from django.core.cache import cache
+from django.db import OperationalError
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from statement.models import LedgerLock
+
+from statement.static.packages import categorizer
+from statement.static.packages import lru_cache
+from statement.static.packages import metrics
+from statement.static.packages import stage_timing
+from statement.static.packages import statement_store
+from statement.static.packages import transactions
+from expense_tracker_app.settings import CHART_CACHE_MAX_ENTRIES
+from expense_tracker_app.settings import LOCAL_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest"
+CUBE = "cube"
+VERSION = "version"
+
+# Deserialized entries keyed by (namespace, name), with their version stamp
+LOCAL_CACHE = lru_cache.LRUCache(LOCAL_CACHE_MAX_ENTRIES)
+# Rendered chart fragments keyed by (statements hash, chart, view parameters)
+CHART_CACHE = lru_cache.LRUCache(CHART_CACHE_MAX_ENTRIES)
+
+
+# {namespace: version stamp} read by the current request, None outside one
+_request_versions = contextvars.ContextVar("request_versions", default=None)
+
+
+class NamespaceLocked(Exception):
+    """The namespace lock could not be acquired in time"""
+
+
+def cache_key(namespace, name):
+    """Cache key of an entry of the namespace"""
+    return f"{namespace}:{name}"
+
+
+def count_lookup(name, tier, hit):
+    """Count a hit or miss of the cache entry in the metrics"""
+    metrics.inc(
+        "statement_cache_lookups_total",
+        {"cache": name, "tier": tier, "result": "hit" if hit else "miss"},
+    )
+
+
+def shared_get(key):
+    """Read an entry of the shared cache, timed as the cache stage"""
+    with stage_timing.stage("cache"):
+        return cache.get(key)
+
+
+@contextlib.contextmanager
+def namespace_lock(namespace):
+    """Run the block in a database transaction holding the ledger lock row of
+    the namespace, so updates of the ledger do not interleave"""
+    with db_transaction.atomic():
+        try:
+            # Writing first takes the row lock, and on SQLite the database
+            # write lock, before the block reads anything
+            locked = LedgerLock.objects.filter(owner=namespace).update(
+                locked=timezone.now()
+            )
+            if not locked:
+                LedgerLock.objects.get_or_create(owner=namespace)
+                LedgerLock.objects.filter(owner=namespace).update(locked=timezone.now())
+        except OperationalError as error:
+            raise NamespaceLocked(namespace) from error
+        yield
+
+
+def start_request():
+    """Read each version stamp once for the rest of the request"""
+    return _request_versions.set({})
+
+
+def end_request(token):
+    """Forget the version stamps read by the request"""
+    _request_versions.reset(token)
+
+
+def bump_version(namespace):
+    """Mark the local copies of the namespace entries stale in every worker"""
+    version = uuid.uuid4().hex
+    cache.set(cache_key(namespace, VERSION), version, timeout=None)
+    versions = _request_versions.get()
+    if versions is not None:
+        versions[namespace] = version
+
+
+def namespace_version(namespace):
+    """Version stamp of the namespace, set again if the shared cache lost it
+
+    Within a request the stamp is only read from the shared cache once.
+    """
+    versions = _request_versions.get()
+    if versions is not None and namespace in versions:
+        return versions[namespace]
+
+    key = cache_key(namespace, VERSION)
+    version = shared_get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = shared_get(key)
+    if versions is not None:
+        versions[namespace] = version
+    return version
+
+
+def local_get(namespace, name, load):
+    """Entry from the in-process cache if its version is current, else load it"""
+    version = namespace_version(namespace)
+    entry = LOCAL_CACHE.get((namespace, name))
+    hit = entry is not None and entry[0] == version
+    count_lookup(name, "local", hit)
+    if hit:
+        return entry[1]
+
+    value = load()
+    LOCAL_CACHE.set((namespace, name), (version, value))
+    return value
+
+
+def load_manifest(namespace):
+    """Uploaded statements of the namespace: {file name: metadata}"""
+    return local_get(
+        namespace, MANIFEST, lambda: transactions.statement_manifest(namespace)
+    )
+
+
+def statements_hash(manifest):
+    """Content hash of all the statements of the manifest"""
+    digest = hashlib.sha1()
+    for statement_file_name, statement in sorted(manifest.items()):
+        digest.update(f"{statement_file_name}:{statement['hash']}".encode())
+    return digest.hexdigest()
+
+
+def invalidate_charts(manifest):
+    """Drop the rendered charts of the statements of the manifest"""
+    content_hash = statements_hash(manifest)
+    CHART_CACHE.delete_matching(lambda key: key[0] == content_hash)
+
+
+def charts_hash(namespace):
+    """Content hash of the statements of the namespace, the charts key prefix"""
+    return statements_hash(load_manifest(namespace))
+
+
+def cached_chart(content_hash, chart, build_chart):
+    """Return the rendered chart from the chart cache, building it on a miss
+
+    Only touches the in-process chart cache, so it is safe to call from the
+    threads building the charts.
+    """
+    key = (content_hash, *chart)
+    plot_html = CHART_CACHE.get(key)
+    count_lookup("chart", "local", plot_html is not None)
+    if plot_html is None:
+        plot_html = build_chart()
+        CHART_CACHE.set(key, plot_html)
+    return plot_html
+
+
+def prepare_statement(statement_file_df):
+    """Categorize the parsed statement and serialize it for the store"""
+    statement_file_df = categorizer.categorize(statement_file_df)
+    statement_file_df = statement_store.normalize_statement(statement_file_df)
+    statement_blob = statement_store.dump_statement(statement_file_df)
+
+    report = statement_store.memory_report(statement_file_df)
+    logger.debug("Prepared statement memory by column: %s", report)
+    metrics.observe("statement_memory_bytes", report["Total"], {"form": "frame"})
+    metrics.observe("statement_memory_bytes", len(statement_blob), {"form": "blob"})
+    return statement_blob
+
+
+def save_statement(namespace, statement_file_name, statement_file_df):
+    """Save the parsed statement and merge it into the ledger of the namespace"""
+    store_statements(
+        namespace, {statement_file_name: prepare_statement(statement_file_df)}
+    )
+
+
+def store_statements(namespace, statement_blobs):
+    """Save the prepared statement blobs and merge them into the ledger at once"""
+    statements = {
+        statement_file_name: (
+            statement_store.load_statement(statement_blob),
+            hashlib.sha1(statement_blob).hexdigest(),
+        )
+        for statement_file_name, statement_blob in statement_blobs.items()
+    }
+
+    with namespace_lock(namespace):
+        invalidate_charts(transactions.statement_manifest(namespace))
+        transactions.save_statements(namespace, statements)
+    # Once committed, or a reader could cache the old ledger as the new version
+    bump_version(namespace)
+
+
+def delete_statement(namespace, statement_file_name):
+    """Remove the statement and take it out of the ledger of the namespace"""
+    with namespace_lock(namespace):
+        manifest = transactions.statement_manifest(namespace)
+        if statement_file_name not in manifest:
+            return
+
+        invalidate_charts(manifest)
+        transactions.delete_statement(namespace, statement_file_name)
+    bump_version(namespace)
+
+
+def load_cube(namespace):
+    """Aggregate cube of the ledger"""
+    return local_get(namespace, CUBE, lambda: read_cube(namespace))
+
+
+def read_cube(namespace):
+    """Read the aggregate cube from the shared cache, summed again if missing
+
+    The shared cube is keyed by the version stamp read before summing, so a
+    cube summed before an update can never be served under its new version.
+    """
+    key = cache_key(namespace, f"{CUBE}:{namespace_version(namespace)}")
+    cube = shared_get(key)
+    count_lookup(CUBE, "shared", cube is not None)
+    if cube is None:
+        cube = transactions.monthly_cube(namespace)
+        cache.set(key, cube)
+    return cube
@@ -1,109 +1,245 @@
 """parser for all the banks to have common base"""
 
 import io
-import pandas as pd
+import time
+import codecs
 
 from django.core.cache import cache
 
+from statement.static.packages import metrics
+from statement.static.packages.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
 STATEMENT_FILES = "bank_statements"
 
+# Rows parsed at a time, so only one chunk of the upload is held as text
+CHUNK_ROWS = 5000
+# Bytes read from the start of the upload to look for the bank header
+HEADER_SNIFF_SIZE = 4096
+
+HDFC_HEADER = " Date     ,Narration                                                                                                                ,Value Dat,Debit Amount       ,Credit Amount      ,Chq/Ref Number   ,Closing Balance"
+ICICI_HEADER = "DATE,MODE,PARTICULARS,DEPOSITS,WITHDRAWALS,BALANCE"
+
+# Bank name -> (header signature, parse function) of each statement format
+PARSERS = {}
+AUTO_DETECT = "Auto Detect"
+
+HDFC_COLUMNS = [
+    "Date",
+    "Narration",
+    "Value Dat",
+    "Debit Amount",
+    "Credit Amount",
+    "Chq/Ref Number",
+    "Closing Balance",
+]
+HDFC_DTYPES = {
+    "Date": "object",
+    "Narration": "object",
+    "Value Dat": "object",
+    # Kept as text: refs have leading zeros, and some are alphanumeric
+    "Chq/Ref Number": "object",
+    "Debit Amount": "float64",
+    "Credit Amount": "float64",
+    "Closing Balance": "float64",
+}
+ICICI_DTYPES = {
+    "DATE": "object",
+    "MODE": "object",
+    "PARTICULARS": "object",
+    "DEPOSITS": "float64",
+    "WITHDRAWALS": "float64",
+    "BALANCE": "float64",
+}
+
+
+class LineStream(io.TextIOBase):
+    """Read only text stream over an iterator of lines"""
+
+    def __init__(self, lines):
+        super().__init__()
+        self._lines = iter(lines)
+        self._pending = ""
+
+    def readable(self):
+        return True
+
+    def readline(self, size=-1):
+        if self._pending:
+            line, self._pending = self._pending, ""
+            return line
+        return next(self._lines, "")
+
+    def read(self, size=-1):
+        parts = [self._pending]
+        length = len(self._pending)
+        for line in self._lines:
+            parts.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+
+        data = "".join(parts)
+        if size is None or size < 0:
+            self._pending = ""
+            return data
+        self._pending = data[size:]
+        return data[:size]
+
+
+def register_parser(bank, header):
+    """Register the parse function of a bank, found by its header signature"""
+
+    def decorator(parse):
+        PARSERS[bank] = (header, parse)
+        return parse
+
+    return decorator
+
+
+def read_header(statement_file):
+    """Peek at the first bytes of the upload, to check the bank header"""
+    statement_file.seek(0)
+    header = statement_file.read(HEADER_SNIFF_SIZE).decode(errors="ignore")
+    statement_file.seek(0)
+    return header
+
+
+def read_lines(statement_file):
+    """Decode the upload line by line, reading it in chunks"""
+    statement_file.seek(0)
+    return codecs.getreader("utf-8")(statement_file)
 
+
+def read_chunks(statement_stream, **kwargs):
+    """Parse the CSV text stream CHUNK_ROWS rows at a time"""
+    return pd.read_csv(statement_stream, chunksize=CHUNK_ROWS, **kwargs)
+
+
+def strip_text_columns(statement_df):
+    """Strip the padding of the text columns, leaving numeric columns as is"""
+    for column in statement_df.select_dtypes(include="object").columns:
+        statement_df[column] = statement_df[column].str.strip()
+    return statement_df
+
+
+def format_hdfc_chunk(statement_df):
+    """To format one chunk of the HDFC bank statement"""
+    statement_df = strip_text_columns(statement_df)
+    statement_df["Date"] = pd.to_datetime(statement_df["Date"], format="%d/%m/%y")
+    statement_df.drop(columns="Value Dat", axis=1)
+
+    return statement_df
+
+
+@register_parser("HDFC", HDFC_HEADER)
 def hdfc_bank(statement_file):
     """To format the HDFC bank statement"""
 
-    statement_file_data = statement_file.read().decode()
-    if (
-        " Date     ,Narration                                                                                                                ,Value Dat,Debit Amount       ,Credit Amount      ,Chq/Ref Number   ,Closing Balance"
-        in statement_file_data
-    ):
-        statement_df = pd.read_csv(io.StringIO(statement_file_data))
-        statement_df = statement_df.applymap(
-            lambda x: x.strip() if isinstance(x, str) else x
-        )
-        statement_df = statement_df.rename(
-            columns={col: col.strip() for col in statement_df.columns}
+    statement_chunks = [
+        format_hdfc_chunk(chunk)
+        for chunk in read_chunks(
+            read_lines(statement_file),
+            header=0,
+            names=HDFC_COLUMNS,
+            dtype=HDFC_DTYPES,
         )
-        statement_df["Date"] = pd.to_datetime(statement_df["Date"], format="%d/%m/%y")
-        statement_df["Date"] = statement_df["Date"].dt.strftime("%d-%m-%Y")
-        statement_df.drop(columns="Value Dat", axis=1)
+    ]
+    statement_df = pd.concat(statement_chunks)
 
-        # statement_df.set_index("Date", inplace=True)
-        statement_df = statement_df.reset_index(drop=True)
+    # statement_df.set_index("Date", inplace=True)
+    statement_df = statement_df.reset_index(drop=True)
 
-    else:
-        return None
-    # statement_lines = raw_statement.split("\r\n")
     return statement_df
 
 
-def icici_credit(statement_file):
-    """To format the HDFC bank statement"""
-    statement_file_data = statement_file.read().decode()
-
-    if "DATE,MODE,PARTICULARS,DEPOSITS,WITHDRAWALS,BALANCE" in statement_file_data:
-        # if "Statement of Transactions in SavingsNumber" in statement_file_data:
-        start, end = 0, 0
-        stmt_lines = statement_file_data.split("/r/n")
-        for i, line in enumerate(stmt_lines):
-            if "Statement of Transactions in SavingsNumber" in line:
-                start = i + 1
-                break
-        stmt_lines = stmt_lines[start:]
-        end = 0
-        for i, line in enumerate(stmt_lines):
-            end = i + 1
-            if line.strip() == "":
-                break
-        stmt_lines = stmt_lines[:end]
+def icici_table_lines(statement_lines):
+    """Lines of the transactions table, from its header to the first blank line"""
+    for line in statement_lines:
+        if ICICI_HEADER in line:
+            yield line
+            break
+    for line in statement_lines:
+        if line.strip() == "":
+            break
+        yield line
+
+
+def format_icici_chunk(statement_df):
+    """To format one chunk of the ICICI bank statement"""
+    statement_df = statement_df.dropna(subset=["DATE"])
+    statement_df = strip_text_columns(statement_df)
+    statement_df = statement_df.rename(
+        columns={col: col.strip().title() for col in statement_df.columns}
+    )
+    statement_df["Date"] = pd.to_datetime(statement_df["Date"], format="%d-%m-%Y")
+
+    statement_df["Narration"] = (
+        statement_df["Mode"].fillna("") + " " + statement_df["Particulars"].fillna("")
+    )
+    statement_df = statement_df.drop(columns=["Mode", "Particulars"], axis=1)
+    statement_df = statement_df.rename(
+        columns={
+            "Deposits": "Credit Amount",
+            "Withdrawals": "Debit Amount",
+            "Balance": "Closing Balance",
+        }
+    )
+    statement_df["Chq/Ref Number"] = "0"
+    statement_df = statement_df.reindex(
+        columns=[
+            "Date",
+            "Narration",
+            "Debit Amount",
+            "Credit Amount",
+            "Chq/Ref Number",
+            "Closing Balance",
+        ]
+    )
 
-        statement_file_data = " /r/n".join(stmt_lines)
-        statement_df = pd.read_csv(io.StringIO(statement_file_data))
-        statement_df.dropna(subset=["DATE"], inplace=True)
-        statement_df = statement_df.applymap(
-            lambda x: x.strip() if isinstance(x, str) else x
-        )
-        statement_df = statement_df.rename(
-            columns={col: col.strip().title() for col in statement_df.columns}
-        )
-        statement_df["Date"] = pd.to_datetime(statement_df["Date"], format="%d-%m-%Y")
-        statement_df["Date"] = statement_df["Date"].dt.strftime("%d-%m-%Y")
+    return statement_df
 
-        statement_df["Narration"] = (
-            statement_df["Mode"].fillna("")
-            + " "
-            + statement_df["Particulars"].fillna("")
-        )
-        statement_df = statement_df.drop(columns=["Mode", "Particulars"], axis=1)
-        statement_df = statement_df.rename(
-            columns={
-                "Deposits": "Credit Amount",
-                "Withdrawals": "Debit Amount",
-                "Balance": "Closing Balance",
-            }
-        )
-        statement_df["Chq/Ref Number"] = 0
-        statement_df = statement_df.reindex(
-            columns=[
-                "Date",
-                "Narration",
-                "Debit Amount",
-                "Credit Amount",
-                "Chq/Ref Number",
-                "Closing Balance",
-            ]
-        )
 
-    else:
-        return None
-    # statement_lines = raw_statement.split("\r\n")
+@register_parser("ICICI", ICICI_HEADER)
+def icici_credit(statement_file):
+    """To format the ICICI bank statement"""
+
+    statement_lines = LineStream(icici_table_lines(read_lines(statement_file)))
+    statement_chunks = [
+        format_icici_chunk(chunk)
+        for chunk in read_chunks(statement_lines, dtype=ICICI_DTYPES, thousands=",")
+    ]
+    statement_df = pd.concat(statement_chunks, ignore_index=True)
+
     return statement_df
 
 
+def detect_bank(header):
+    """Bank whose header signature is found in the start of the upload"""
+    for bank, (signature, _) in PARSERS.items():
+        if signature in header:
+            return bank
+
+    return None
+
+
 def parse_statement(bank, statement_file):
     """To redirect to the specific parse"""
-    if bank == "HDFC":
-        return hdfc_bank(statement_file)
-    if bank == "ICICI":
-        return icici_credit(statement_file)
+    header = read_header(statement_file)
+    if bank == AUTO_DETECT:
+        bank = detect_bank(header)
+    if bank not in PARSERS:
+        return None
 
-    return None
+    signature, parse = PARSERS[bank]
+    if signature not in header:
+        return None
+
+    start = time.perf_counter()
+    statement_df = parse(statement_file)
+    metrics.inc("statement_parse_rows_total", {"bank": bank}, len(statement_df))
+    metrics.inc(
+        "statement_parse_seconds_total", {"bank": bank}, time.perf_counter() - start
+    )
+    return statement_df
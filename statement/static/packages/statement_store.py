@@ -0,0 +1,141 @@
+"""Typed columnar storage for the parsed statements"""
+
+import pickle
+
+from statement.static.packages import stage_timing
+from statement.static.packages.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+DATE_COLUMNS = ["Date"]
+AMOUNT_COLUMNS = ["Debit Amount", "Credit Amount", "Closing Balance"]
+# Repeated text is kept once per distinct value, as categorical codes. The
+# narrations are mostly unique, they stay plain strings
+CATEGORY_COLUMNS = ["Value Dat", "Mode", "Category Inner"]
+
+
+def normalize_statement(statement_df):
+    """Cast the parsed statement to the dtypes kept in the store, sorted by date"""
+    statement_df = statement_df.reset_index(drop=True)
+
+    for column in DATE_COLUMNS:
+        if not pd.api.types.is_datetime64_dtype(statement_df[column]):
+            statement_df[column] = pd.to_datetime(
+                statement_df[column], format="%d-%m-%Y"
+            )
+    for column in AMOUNT_COLUMNS:
+        if column in statement_df.columns:
+            statement_df[column] = pd.to_numeric(
+                statement_df[column], errors="coerce"
+            ).astype("float64")
+    for column in CATEGORY_COLUMNS:
+        if column in statement_df.columns:
+            statement_df[column] = statement_df[column].astype("category")
+
+    statement_df = statement_df.sort_values("Date", kind="stable")
+    return statement_df.reset_index(drop=True)
+
+
+def parse_date(date):
+    """Day of the date string, None if it is missing or invalid"""
+    try:
+        date = np.datetime64(date, "D")
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnat(date) else date
+
+
+def pack_text(strings):
+    """Strings as one UTF-8 arena and the offsets of each string in it"""
+    encoded = [string.encode() for string in strings]
+    offsets = np.cumsum([0, *map(len, encoded)])
+    return b"".join(encoded), offsets.astype(np.min_scalar_type(offsets[-1]))
+
+
+def unpack_text(arena, offsets):
+    """Strings of the UTF-8 arena"""
+    return [arena[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+
+
+def to_paise(amounts):
+    """Amounts as integer paise, None if that would not round-trip exactly"""
+    if np.isnan(amounts).any():
+        return None
+    paise = np.round(amounts * 100)
+    if not np.array_equal(paise / 100, amounts):
+        return None
+    return pd.to_numeric(paise.astype("int64"), downcast="integer")
+
+
+def dump_statement(statement_df):
+    """Serialize the statement as a binary blob of compact per column arrays
+
+    Dates are stored as int32 day offsets, amounts as integer paise, integers
+    in the narrowest dtype that fits, and text, or text categories, in a UTF-8
+    arena.
+    """
+    columns = []
+    for name, column in statement_df.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            categories = column.cat.categories
+            if pd.api.types.infer_dtype(categories) == "string":
+                columns.append(
+                    (name, "text", column.cat.codes.to_numpy(), pack_text(categories))
+                )
+            else:
+                columns.append(
+                    (
+                        name,
+                        "category",
+                        column.cat.codes.to_numpy(),
+                        categories.to_numpy(),
+                    )
+                )
+        elif pd.api.types.is_datetime64_dtype(column) and column.notna().all():
+            days = column.to_numpy().astype("datetime64[D]").astype("int32")
+            columns.append((name, "days", days, None))
+        elif pd.api.types.is_float_dtype(column) and (
+            (paise := to_paise(column.to_numpy())) is not None
+        ):
+            columns.append((name, "paise", paise, column.dtype.str))
+        elif pd.api.types.infer_dtype(column, skipna=False) == "string":
+            columns.append((name, "strings", None, pack_text(column)))
+        elif pd.api.types.is_integer_dtype(column):
+            values = pd.to_numeric(column.to_numpy(), downcast="integer")
+            columns.append((name, "integer", values, column.dtype.str))
+        else:
+            columns.append((name, "array", column.to_numpy(), None))
+
+    return pickle.dumps(columns, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def memory_report(statement_df):
+    """Bytes held by each column of the statement DF, and their total"""
+    usage = statement_df.memory_usage(deep=True, index=False)
+    return {**usage.astype(int).to_dict(), "Total": int(usage.sum())}
+
+
+@stage_timing.stage("decode")
+def load_statement(statement_blob):
+    """Rebuild the statement DF from the stored blob"""
+    columns = {}
+    for name, kind, values, details in pickle.loads(statement_blob):
+        if kind == "text":
+            columns[name] = pd.Categorical.from_codes(
+                values, categories=unpack_text(*details)
+            )
+        elif kind == "strings":
+            columns[name] = np.array(unpack_text(*details), dtype=object)
+        elif kind == "category":
+            columns[name] = pd.Categorical.from_codes(values, categories=details)
+        elif kind == "days":
+            columns[name] = values.astype("datetime64[D]").astype("datetime64[ns]")
+        elif kind == "paise":
+            columns[name] = (values / 100).astype(details)
+        elif kind == "integer":
+            columns[name] = values.astype(details)
+        else:
+            columns[name] = values
+
+    return pd.DataFrame(columns, copy=False)
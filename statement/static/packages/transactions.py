@@ -0,0 +1,323 @@
+"""Transactions of the uploaded statements, stored in the database"""
+
+from django.db import transaction as db_transaction
+from django.db.models import Count
+from django.db.models import Max
+from django.db.models import Min
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from statement.models import MonthlySummary
+from statement.models import Statement
+from statement.models import Transaction
+from statement.static.packages import aggregates
+from statement.static.packages import ledger
+from statement.static.packages import stage_timing
+from statement.static.packages import statement_store
+from statement.static.packages.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+# Rows inserted, and hashes looked up, per query
+BATCH_SIZE = 2000
+
+# Statement column -> Transaction field
+COLUMN_FIELDS = {
+    "Date": "date",
+    "Narration": "narration",
+    "Value Dat": "value_date",
+    "Debit Amount": "debit",
+    "Credit Amount": "credit",
+    "Chq/Ref Number": "ref_number",
+    "Closing Balance": "closing_balance",
+    "Mode": "mode",
+    "Category Inner": "category",
+}
+TEXT_COLUMNS = ["Narration", "Value Dat", "Chq/Ref Number", "Mode", "Category Inner"]
+AMOUNT_COLUMNS = ["Debit Amount", "Credit Amount", "Closing Balance"]
+# Columns of the monthly report: (name, kind, sum_by_month field)
+MONTHLY_REPORT_COLUMNS = [
+    ("Month", "date", "month"),
+    ("Direction", "text", "direction"),
+    ("Mode", "text", "mode"),
+    ("Category Inner", "text", "category"),
+    ("Amount", "float", "amount"),
+    ("Count", "int", "count"),
+]
+
+
+def column_values(statement_df, column):
+    """Python values of the statement column, as stored in its field"""
+    if column not in statement_df.columns:
+        return [""] * len(statement_df)
+
+    values = statement_df[column]
+    if column == "Date":
+        return values.dt.date.tolist()
+    if column in TEXT_COLUMNS:
+        values = values.astype(object)
+        return ["" if pd.isna(value) else str(value) for value in values]
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def transaction_rows(namespace, statement_df, hashes):
+    """Transaction objects of the statement rows"""
+    columns = [column_values(statement_df, column) for column in COLUMN_FIELDS]
+    for row_hash, values in zip(hashes.tolist(), zip(*columns)):
+        yield Transaction(
+            owner=namespace,
+            row_hash=row_hash,
+            **dict(zip(COLUMN_FIELDS.values(), values)),
+        )
+
+
+def link_transactions(namespace, statement, hashes):
+    """Link the statement to its (possibly already stored) transactions"""
+    through = Statement.transactions.through
+    for start in range(0, len(hashes), BATCH_SIZE):
+        transaction_ids = Transaction.objects.filter(
+            owner=namespace, row_hash__in=hashes[start : start + BATCH_SIZE].tolist()
+        ).values_list("id", flat=True)
+        through.objects.bulk_create(
+            [
+                through(statement_id=statement.id, transaction_id=transaction_id)
+                for transaction_id in transaction_ids
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def sum_by_month(queryset):
+    """Amount and count of the transactions by month, direction and category"""
+    records = []
+    for direction, column in aggregates.DIRECTIONS.items():
+        field = COLUMN_FIELDS[column]
+        records.extend(
+            {"direction": direction, **record}
+            for record in (
+                queryset.filter(**{f"{field}__isnull": False})
+                .exclude(**{field: 0.0})
+                .values("mode", "category", month=TruncMonth("date"))
+                .annotate(amount=Sum(field), count=Count("id"))
+                .order_by()
+            )
+        )
+    return records
+
+
+def remove_orphans(namespace):
+    """Delete the transactions that are left in no statement, returning their
+    monthly totals"""
+    orphans = Transaction.objects.filter(owner=namespace, statements=None)
+    removed = sum_by_month(orphans)
+    orphans.delete()
+    return removed
+
+
+def update_summaries(namespace, added, removed):
+    """Add the monthly totals of the added transactions to the summaries of the
+    namespace, and subtract those of the removed ones"""
+    deltas = {}
+    for sign, records in [(1, added), (-1, removed)]:
+        for record in records:
+            key = (
+                record["month"],
+                record["direction"],
+                record["mode"],
+                record["category"],
+            )
+            amount, count = deltas.get(key, (0.0, 0))
+            deltas[key] = (
+                amount + sign * record["amount"],
+                count + sign * record["count"],
+            )
+
+    summaries = {
+        (summary.month, summary.direction, summary.mode, summary.category): summary
+        for summary in MonthlySummary.objects.filter(owner=namespace)
+    }
+    created, updated, deleted = [], [], []
+    for key, (amount, count) in deltas.items():
+        summary = summaries.get(key) or MonthlySummary(
+            owner=namespace,
+            **dict(zip(["month", "direction", "mode", "category"], key)),
+            amount=0.0,
+            count=0,
+        )
+        # Amounts are in paise, drop the float error of the running sums
+        summary.amount = round(summary.amount + amount, 2)
+        summary.count += count
+        if summary.count <= 0:
+            if summary.pk is not None:
+                deleted.append(summary.pk)
+        elif summary.pk is None:
+            created.append(summary)
+        else:
+            updated.append(summary)
+
+    MonthlySummary.objects.bulk_create(created)
+    MonthlySummary.objects.bulk_update(updated, ["amount", "count"])
+    MonthlySummary.objects.filter(pk__in=deleted).delete()
+
+
+@stage_timing.stage("query")
+def save_statements(namespace, statements):
+    """Store the {name: (statement DF, content hash)} statements, replacing any
+    previous version, and merge their transactions into the ledger"""
+    with db_transaction.atomic():
+        Statement.objects.filter(owner=namespace, name__in=list(statements)).delete()
+        # Transactions inserted below get higher ids
+        last_id = Transaction.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+
+        for statement_file_name, (statement_df, content_hash) in statements.items():
+            statement_df, hashes = ledger.unique_rows(statement_df)
+            # Signed, to fit in an SQLite integer
+            hashes = hashes.view("int64")
+            dates = statement_df["Date"].dropna()
+
+            statement = Statement.objects.create(
+                owner=namespace,
+                name=statement_file_name,
+                content_hash=content_hash,
+                rows=len(statement_df),
+                first_date=dates.min().date() if len(dates) else None,
+                last_date=dates.max().date() if len(dates) else None,
+            )
+            Transaction.objects.bulk_create(
+                transaction_rows(namespace, statement_df, hashes),
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            link_transactions(namespace, statement, hashes)
+
+        added = sum_by_month(
+            Transaction.objects.filter(owner=namespace, id__gt=last_id)
+        )
+        # Transactions only found in the replaced versions
+        update_summaries(namespace, added, remove_orphans(namespace))
+
+
+@stage_timing.stage("query")
+def delete_statement(namespace, statement_file_name):
+    """Delete the statement and the transactions found in no other statement"""
+    with db_transaction.atomic():
+        Statement.objects.filter(owner=namespace, name=statement_file_name).delete()
+        update_summaries(namespace, [], remove_orphans(namespace))
+
+
+@stage_timing.stage("query")
+def statement_manifest(namespace):
+    """Uploaded statements of the namespace: {file name: metadata}"""
+    return {
+        statement.name: {
+            "hash": statement.content_hash,
+            "rows": statement.rows,
+            "uploaded": statement.uploaded.timestamp(),
+        }
+        for statement in Statement.objects.filter(owner=namespace).order_by("name")
+    }
+
+
+@stage_timing.stage("query")
+def monthly_cube(namespace):
+    """Aggregate cube of the ledger, from its monthly summaries"""
+    return aggregates.cube_from_records(
+        MonthlySummary.objects.filter(owner=namespace).values(
+            "month", "direction", "mode", "category", "amount", "count"
+        )
+    )
+
+
+def filter_transactions(namespace, filters):
+    """Transactions of the namespace selected by the statement table filters"""
+    queryset = Transaction.objects.filter(owner=namespace)
+
+    start_date = statement_store.parse_date(filters["start_date"])
+    if start_date is not None:
+        queryset = queryset.filter(date__gte=start_date.item())
+    end_date = statement_store.parse_date(filters["end_date"])
+    if end_date is not None:
+        queryset = queryset.filter(date__lte=end_date.item())
+    if filters["category"] != "All":
+        queryset = queryset.filter(category=filters["category"])
+    if filters["search"]:
+        queryset = queryset.filter(narration__icontains=filters["search"])
+    if filters["credit_or_debit"] == "Debit":
+        queryset = queryset.filter(debit__gt=0.0)
+    if filters["credit_or_debit"] == "Credit":
+        queryset = queryset.filter(credit__gt=0.0)
+
+    return queryset.order_by("date", "id")
+
+
+def sort_transactions(queryset, column, ascending=True):
+    """Order the transactions by the statement column, then by date"""
+    field = COLUMN_FIELDS[column]
+    return queryset.order_by(field if ascending else f"-{field}", "date", "id")
+
+
+@stage_timing.stage("query")
+def transactions_frame(queryset, columns):
+    """Statement DF of the selected transactions, indexed by transaction id"""
+    fields = [COLUMN_FIELDS[column] for column in columns]
+    statement_df = pd.DataFrame.from_records(
+        list(queryset.values_list("id", *fields)),
+        columns=["id", *columns],
+        index="id",
+    )
+    if "Date" in columns:
+        statement_df["Date"] = pd.to_datetime(statement_df["Date"])
+    return statement_df
+
+
+@stage_timing.stage("query")
+def ledger_bounds(namespace):
+    """First and last date of the ledger, and its sorted categories"""
+    dates = Statement.objects.filter(owner=namespace).aggregate(
+        min_date=Min("first_date"), max_date=Max("last_date")
+    )
+    categories = list(
+        MonthlySummary.objects.filter(owner=namespace)
+        .order_by("category")
+        .values_list("category", flat=True)
+        .distinct()
+    )
+    return dates["min_date"], dates["max_date"], categories
+
+
+def export_transactions(queryset):
+    """[(name, kind)] columns and values_list rows of the selected transactions"""
+    columns = [
+        (
+            column,
+            (
+                "date"
+                if column == "Date"
+                else "float" if column in AMOUNT_COLUMNS else "text"
+            ),
+        )
+        for column in COLUMN_FIELDS
+    ]
+    return columns, queryset.values_list(*COLUMN_FIELDS.values())
+
+
+def export_monthly_report(namespace, filters):
+    """[(name, kind)] columns and rows of the monthly totals of the transactions
+    selected by the statement table filters"""
+    # Summed from the transactions, the stored summaries cannot apply day
+    # bounds or the narration search
+    records = sum_by_month(filter_transactions(namespace, filters))
+    records.sort(
+        key=lambda record: (
+            record["month"],
+            record["direction"],
+            record["category"],
+            record["mode"],
+        )
+    )
+    for record in records:
+        record["amount"] = round(record["amount"], 2)
+
+    columns = [(name, kind) for name, kind, _ in MONTHLY_REPORT_COLUMNS]
+    fields = [field for _, _, field in MONTHLY_REPORT_COLUMNS]
+    return columns, [tuple(record[field] for field in fields) for record in records]
@@ -0,0 +1,163 @@
+"""Background processing of the uploaded statements
+
+Parsing, categorization and serialization run in a process pool, so a large
+upload does not hold the web worker, and the files of a bulk upload are parsed
+in parallel. The prepared statements are then merged into the ledger of the
+namespace together, and the job status is kept in the cache for the upload
+page to poll.
+"""
+
+import io
+import uuid
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.db import connections
+from django.core.cache import cache
+
+from statement.static.packages import statement_cache
+from statement.static.packages import statement_parser
+from expense_tracker_app.settings import STATEMENT_UPLOAD_WORKERS
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# Seconds the status of a job is kept after its last update
+JOB_TIMEOUT = 60 * 60
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor(broken=None):
+    """Process pool of the upload workers, started on first use
+
+    A broken pool (a worker was killed) is replaced by a new one.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None or _executor is broken:
+            _executor = ProcessPoolExecutor(
+                max_workers=STATEMENT_UPLOAD_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                # Spawned workers import the models through the statement cache
+                initializer=django.setup,
+            )
+        return _executor
+
+
+def job_key(namespace, job_id):
+    """Cache key of the status of an upload job"""
+    return statement_cache.cache_key(namespace, f"job:{job_id}")
+
+
+def set_status(namespace, job_id, statement_file_names, status, **details):
+    """Save the status of the upload job"""
+    cache.set(
+        job_key(namespace, job_id),
+        {"files": statement_file_names, "status": status, **details},
+        timeout=JOB_TIMEOUT,
+    )
+
+
+def job_status(namespace, job_id):
+    """Status of the upload job of the namespace, None if it is unknown"""
+    return cache.get(job_key(namespace, job_id))
+
+
+def prepare_upload(bank, statement_data):
+    """Parse the uploaded bytes into a statement blob, None if not supported"""
+    statement_file_df = statement_parser.parse_statement(
+        bank, io.BytesIO(statement_data)
+    )
+    if statement_file_df is None:
+        return None
+    return statement_cache.prepare_statement(statement_file_df)
+
+
+def submit_prepare(bank, statement_data):
+    """Future of the prepared upload, in the pool or in the request"""
+    if not STATEMENT_UPLOAD_WORKERS:
+        # No pool (e.g. serverless), the upload is processed in the request
+        future = Future()
+        try:
+            future.set_result(prepare_upload(bank, statement_data))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    pool = executor()
+    try:
+        return pool.submit(prepare_upload, bank, statement_data)
+    except BrokenProcessPool:
+        return executor(broken=pool).submit(prepare_upload, bank, statement_data)
+
+
+def finish_uploads(namespace, job_id, futures):
+    """Merge all the prepared statements into the ledger at once"""
+    statement_file_names = list(futures)
+    statement_blobs = {}
+    failed = []
+    for statement_file_name, future in futures.items():
+        try:
+            statement_blob = future.result()
+        except Exception:
+            logger.exception("Upload of %s failed", statement_file_name)
+            statement_blob = None
+
+        if statement_blob is None:
+            failed.append(statement_file_name)
+        else:
+            statement_blobs[statement_file_name] = statement_blob
+
+    if not statement_blobs:
+        set_status(namespace, job_id, statement_file_names, FAILED, failed=failed)
+        return
+
+    try:
+        statement_cache.store_statements(namespace, statement_blobs)
+    except Exception:
+        logger.exception("Saving the uploads of job %s failed", job_id)
+        set_status(
+            namespace, job_id, statement_file_names, FAILED, failed=statement_file_names
+        )
+        return
+    set_status(namespace, job_id, statement_file_names, DONE, failed=failed)
+
+
+def finish_background(namespace, job_id, futures):
+    """Finish the uploads in a background thread, closing its connections"""
+    try:
+        finish_uploads(namespace, job_id, futures)
+    finally:
+        connections.close_all()
+
+
+def submit_uploads(namespace, bank, statement_files):
+    """Queue the uploaded (name, bytes) statements for processing
+
+    The statements are parsed in parallel and merged into the ledger together.
+    Returns the job id.
+    """
+    job_id = uuid.uuid4().hex
+    futures = {
+        statement_file_name: submit_prepare(bank, statement_data)
+        for statement_file_name, statement_data in statement_files
+    }
+    set_status(namespace, job_id, list(futures), PENDING)
+
+    if not STATEMENT_UPLOAD_WORKERS:
+        finish_uploads(namespace, job_id, futures)
+    else:
+        threading.Thread(
+            target=finish_background, args=(namespace, job_id, futures), daemon=True
+        ).start()
+    return job_id
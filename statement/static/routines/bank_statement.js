@@ -0,0 +1,77 @@
+// Load the rows of the statement table one page at a time
+let statementOffset = 0;
+let statementSort = null;
+let statementOrder = "asc";
+
+function loadStatementRows() {
+  let table = document.getElementById("statement-table");
+  let params = new URLSearchParams(window.location.search);
+  params.set("offset", statementOffset);
+  params.set("limit", table.dataset.pageSize);
+  if (statementSort !== null) {
+    params.set("sort", statementSort);
+    params.set("order", statementOrder);
+  }
+  fetch(table.dataset.url + "?" + params.toString())
+    .then(function(response) { return response.json(); })
+    .then(showStatementRows);
+}
+
+// Sort by the column, toggling the order when it is already sorted by it
+function sortStatementRows(column) {
+  if (statementSort === column) {
+    statementOrder = statementOrder === "asc" ? "desc" : "asc";
+  } else {
+    statementSort = column;
+    statementOrder = "asc";
+  }
+  statementOffset = 0;
+  loadStatementRows();
+}
+
+function showStatementRows(page) {
+  let table = document.getElementById("statement-table");
+  table.replaceChildren();
+
+  let header = table.createTHead().insertRow();
+  page.columns.forEach(function(column) {
+    let cell = document.createElement("th");
+    cell.textContent = column;
+    if (column === statementSort) {
+      cell.textContent += statementOrder === "asc" ? " ▲" : " ▼";
+    }
+    cell.onclick = function() { sortStatementRows(column); };
+    header.appendChild(cell);
+  });
+
+  let body = table.createTBody();
+  page.rows.forEach(function(row) {
+    let line = body.insertRow();
+    row.forEach(function(value) {
+      line.insertCell().textContent = value === null ? "" : value;
+    });
+  });
+
+  let last = Math.min(page.offset + page.limit, page.total);
+  document.getElementById("page-info").textContent =
+    (page.total ? page.offset + 1 : 0) + " - " + last + " of " + page.total;
+  document.getElementById("previous-page").disabled = page.offset === 0;
+  document.getElementById("next-page").disabled = last >= page.total;
+}
+
+document.addEventListener("DOMContentLoaded", function(event) {
+  let table = document.getElementById("statement-table");
+  if (table === null) {
+    return;
+  }
+  let pageSize = parseInt(table.dataset.pageSize);
+  document.getElementById("previous-page").onclick = function() {
+    statementOffset = Math.max(statementOffset - pageSize, 0);
+    loadStatementRows();
+  };
+  document.getElementById("next-page").onclick = function() {
+    statementOffset += pageSize;
+    loadStatementRows();
+  };
+  loadStatementRows();
+});
@@ -0,0 +1,8 @@
+// Draw the plotly figures that are embedded in the page as JSON specs
+document.addEventListener("DOMContentLoaded", function(event) {
+  var figures = document.getElementsByClassName("plotly-figure");
+  for (var i = 0; i < figures.length; i++) {
+    var spec = JSON.parse(figures[i].querySelector("script").textContent);
+    Plotly.newPlot(figures[i], spec.data, spec.layout);
+  }
+});
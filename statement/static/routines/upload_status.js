@@ -0,0 +1,31 @@
+// Poll the status of the queued upload, reloading the page once it is saved
+const UPLOAD_POLL_INTERVAL = 1000;
+
+function pollUploadStatus() {
+  let status = document.getElementById("upload-status");
+  fetch(status.dataset.url)
+    .then(function(response) { return response.json(); })
+    .then(function(job) {
+      if (job.status === "pending") {
+        setTimeout(pollUploadStatus, UPLOAD_POLL_INTERVAL);
+      } else if (job.status === "done" && job.failed.length === 0) {
+        window.location.assign(window.location.pathname);
+      } else if (job.status === "done") {
+        status.innerHTML = "";
+        status.append(
+          "Error: File format not supported: " + job.failed.join(", ") + ". ",
+          Object.assign(document.createElement("a"), {
+            href: window.location.pathname,
+            textContent: "View the other statements",
+          })
+        );
+      } else if (job.status === "failed") {
+        status.textContent =
+          "Error: File format not supported: " + job.failed.join(", ") + ".";
+      } else {
+        status.textContent = "Error: The upload was not found.";
+      }
+    });
+}
+
+document.addEventListener("DOMContentLoaded", pollUploadStatus);
@@ -1,3 +1,165 @@
+import io
+import uuid
+import datetime
+
 from django.test import TestCase
+from django.test import override_settings
+
+from statement.models import MonthlySummary
+from statement.models import Statement
+from statement.models import Transaction
+from statement import views
+from statement.static.packages import aggregates
+from statement.static.packages import statement_cache
+from statement.static.packages import statement_parser
+from statement.static.packages import transactions
+
+LOCAL_MEMORY_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+# (date, narration, debit, credit, ref, closing balance) of the HDFC statements
+JANUARY = [
+    ("03/01/22", "UPI-SWIGGY-ORDER", "250.50", "0.00", "000412345678", "9749.50"),
+    ("10/01/22", "NEFT CR-SALARY", "0.00", "50000.00", "000000412399", "59749.50"),
+    ("18/01/22", "ATW-512967XXXX-CASH", "2000.00", "0.00", "000000000001", "57749.50"),
+]
+FEBRUARY = [
+    ("02/02/22", "UPI-SWIGGY-ORDER", "120.25", "0.00", "000412345690", "57629.25"),
+    ("14/02/22", "IMPS-312-RENT", "15000.00", "0.00", "IMPS00AB12", "42629.25"),
+]
+LATE_FEBRUARY = [
+    ("27/02/22", "UPI-ZOMATO-ORDER", "99.99", "0.00", "000412345699", "42529.26"),
+]
+
+
+def hdfc_statement(rows):
+    """Parsed HDFC statement of the rows"""
+    lines = [statement_parser.HDFC_HEADER]
+    for date, narration, debit, credit, ref, balance in rows:
+        lines.append(f"{date} ,{narration},{date},{debit},{credit},{ref},{balance}")
+    statement_file = io.BytesIO(("\n".join(lines) + "\n").encode())
+    return statement_parser.parse_statement("HDFC", statement_file)
+
+
+@override_settings(CACHES=LOCAL_MEMORY_CACHE)
+class LedgerSummaryTests(TestCase):
+    """Monthly summaries kept in step with the transactions of the ledger"""
+
+    def setUp(self):
+        self.namespace = f"test-{uuid.uuid4().hex}"
+
+    def save(self, statement_file_name, rows):
+        statement_cache.save_statement(
+            self.namespace, statement_file_name, hdfc_statement(rows)
+        )
+
+    def assertSummariesMatchTransactions(self):
+        summaries = {
+            (summary.month, summary.direction, summary.mode, summary.category): (
+                summary.amount,
+                summary.count,
+            )
+            for summary in MonthlySummary.objects.filter(owner=self.namespace)
+        }
+        expected = {
+            (
+                record["month"],
+                record["direction"],
+                record["mode"],
+                record["category"],
+            ): (
+                round(record["amount"], 2),
+                record["count"],
+            )
+            for record in transactions.sum_by_month(
+                Transaction.objects.filter(owner=self.namespace)
+            )
+        }
+        self.assertEqual(summaries, expected)
+
+    def transaction_count(self):
+        return Transaction.objects.filter(owner=self.namespace).count()
+
+    def test_overlapping_statements(self):
+        self.save("january.csv", JANUARY)
+        self.assertEqual(self.transaction_count(), 3)
+        self.assertSummariesMatchTransactions()
+
+        # Its refs are not all numeric, the January rows must still match
+        self.save("january_february.csv", JANUARY + FEBRUARY)
+        self.assertEqual(self.transaction_count(), 5)
+        self.assertSummariesMatchTransactions()
+
+    def test_reupload_statement(self):
+        self.save("january.csv", JANUARY)
+        self.save("january_february.csv", JANUARY + FEBRUARY)
+
+        # The new version drops a row only it had, and adds another
+        self.save("january_february.csv", JANUARY + FEBRUARY[:1] + LATE_FEBRUARY)
+        self.assertEqual(self.transaction_count(), 5)
+        self.assertFalse(
+            Transaction.objects.filter(
+                owner=self.namespace, ref_number="IMPS00AB12"
+            ).exists()
+        )
+        self.assertSummariesMatchTransactions()
+
+        self.save("january_february.csv", JANUARY + FEBRUARY[:1] + LATE_FEBRUARY)
+        self.assertEqual(self.transaction_count(), 5)
+        self.assertSummariesMatchTransactions()
+
+    def test_delete_statement(self):
+        self.save("january.csv", JANUARY)
+        self.save("january_february.csv", JANUARY + FEBRUARY)
+
+        # Its transactions are still in the other statement
+        statement_cache.delete_statement(self.namespace, "january.csv")
+        self.assertEqual(self.transaction_count(), 5)
+        self.assertSummariesMatchTransactions()
+
+        statement_cache.delete_statement(self.namespace, "january_february.csv")
+        self.assertEqual(self.transaction_count(), 0)
+        self.assertFalse(Statement.objects.filter(owner=self.namespace).exists())
+        self.assertFalse(MonthlySummary.objects.filter(owner=self.namespace).exists())
+
+    def test_refs_are_kept_as_text(self):
+        self.save("january.csv", JANUARY)
+        self.assertEqual(
+            sorted(
+                Transaction.objects.filter(owner=self.namespace).values_list(
+                    "ref_number", flat=True
+                )
+            ),
+            ["000000000001", "000000412399", "000412345678"],
+        )
+
+
+class DashboardChartTests(TestCase):
+    """Charts of ledgers with transactions in one direction only"""
+
+    def debit_only_cube(self):
+        return aggregates.cube_from_records(
+            [
+                {
+                    "month": datetime.date(2022, month, 1),
+                    "direction": "Debit",
+                    "mode": "UPI",
+                    "category": "UPI-SWIGGY",
+                    "amount": 250.5 * month,
+                    "count": month,
+                }
+                for month in (1, 2, 3)
+            ]
+        )
+
+    def test_monthly_totals_of_missing_direction(self):
+        cube = self.debit_only_cube()
+        months = aggregates.cube_months(cube)
+        totals = aggregates.monthly_totals(cube, "Credit", months)
+        self.assertEqual(list(totals.index), list(months))
+        self.assertEqual(totals.tolist(), [0.0, 0.0, 0.0])
 
-# Create your tests here.
+    def test_bar_chart_of_debit_only_ledger(self):
+        plot_html = views.statement_as_bar(uuid.uuid4().hex, self.debit_only_cube())
+        self.assertIn("plotly", plot_html)
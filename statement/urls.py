@@ -10,8 +10,24 @@ from . import views
 urlpatterns = [
     path(route="", view=views.starting_page, name="starting-page"),
     path(route="upload/", view=views.upload_file, name="upload-file"),
+    path(
+        route="upload/status/<str:job_id>/",
+        view=views.upload_status,
+        name="upload-status",
+    ),
     path(route="no-statement/", view=views.no_statement, name="no-statement"),
     path(route="bank-statement/", view=views.bank_statement, name="bank-statement"),
+    path(
+        route="bank-statement/rows/",
+        view=views.bank_statement_rows,
+        name="bank-statement-rows",
+    ),
+    path(
+        route="bank-statement/export/",
+        view=views.bank_statement_export,
+        name="bank-statement-export",
+    ),
     path(route="help/", view=views.help_page, name="help"),
+    path(route="metrics/", view=views.metrics_page, name="metrics"),
 ]
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
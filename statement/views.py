@@ -1,31 +1,80 @@
 """View for Statement"""
 
 import os
-import re
-import io
-
-import pandas as pd
+import json
+import uuid
+import hashlib
+import asyncio
+import functools
+import zipfile
+import threading
+from importlib import metadata
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.shortcuts import redirect
-from django.core.cache import cache
+from django.http import HttpResponse
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
 from django import forms
 
-import plotly.graph_objs as go
-import plotly.offline as opy
-
+from statement.static.packages import aggregates
+from statement.static.packages import categorizer
+from statement.static.packages import exporters
+from statement.static.packages import metrics
+from statement.static.packages import statement_cache
 from statement.static.packages import statement_parser
+from statement.static.packages import stage_timing
+from statement.static.packages import transactions
+from statement.static.packages import upload_jobs
+from statement.static.packages.lazy_import import lazy_import
 from expense_tracker_app.settings import BASE_DIR
+from expense_tracker_app.settings import RELEASE_VERSION
+from expense_tracker_app.settings import STATEMENT_MAX_FILES
+from expense_tracker_app.settings import STATEMENT_MAX_TOTAL_SIZE
+from expense_tracker_app.settings import STATEMENT_MAX_UPLOAD_SIZE
+
+# pandas and plotly are loaded on first use, so the pages that do not need
+# them (help, upload status, metrics) do not pay for their import
+go = lazy_import("plotly.graph_objs")
 
 # Create your views here.
 
-BANKS = [
-    "HDFC",
-    "ICICI",
-]
+BANKS = list(statement_parser.PARSERS)
 
-STATEMENT_FILES = "bank_statements"
+SESSION_NAMESPACE = "statement_namespace"
+STATEMENT_EXTENSIONS = (".txt", ".csv", ".CSV")
+STATEMENT_PAGE_SIZE = 100
+STATEMENT_MAX_PAGE_SIZE = 1000
 IMAGE_PATH = os.path.join(BASE_DIR, "media", "images")
 
+# Version query string of the plotly.js static asset, for cache busting
+PLOTLY_JS_VERSION = metadata.version("plotly")
+# Escapes for embedding the figure JSON inside a <script> tag
+FIGURE_JSON_ESCAPES = {
+    ord("<"): "\\u003C",
+    ord(">"): "\\u003E",
+    ord("&"): "\\u0026",
+}
+
+
+_plotly_lock = threading.Lock()
+_plotly_loaded = False
+
+
+def load_plotly():
+    """Load plotly once, before the dashboard charts are built concurrently"""
+    global _plotly_loaded
+    # The lazy module and plotly's own lazy JSON encoder are not thread safe,
+    # concurrent first requests wait for a single warm-up
+    with _plotly_lock:
+        if not _plotly_loaded:
+            go.Figure().to_json()
+            _plotly_loaded = True
+
 
 class BooleanForm(forms.Form):
     """To have a Boolean switch in the form"""
@@ -39,81 +88,251 @@ def ensure_dirs(directory):
         os.makedirs(directory)
 
 
+def statement_namespace(request):
+    """Namespace of the statements of the logged in user, or of the session"""
+    if request.user.is_authenticated:
+        return f"user-{request.user.pk}"
+
+    namespace = request.session.get(SESSION_NAMESPACE)
+    if namespace is None:
+        namespace = uuid.uuid4().hex
+        request.session[SESSION_NAMESPACE] = namespace
+    return f"session-{namespace}"
+
+
 def verify_uploads(request):
     """To verify if user have already uploaded some files"""
-    files = None
-    statement_files_string = cache.get(STATEMENT_FILES)
+    files = list(statement_cache.load_manifest(statement_namespace(request)))
+    return files or None
+
+
+def page_etag(request, parameters):
+    """Strong ETag of the page for the ledger version and the query parameters"""
+    version = statement_cache.namespace_version(statement_namespace(request))
+    query = [request.GET.get(name, "").strip() for name in parameters]
+    page = json.dumps([RELEASE_VERSION, request.path, version, query])
+    return f'"{hashlib.sha1(page.encode()).hexdigest()}"'
+
+
+def cache_headers(response, etag):
+    """Make the browser revalidate the page with its ETag on every use"""
+    response.headers["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(*parameters):
+    """Answer a GET of the page with 304 Not Modified, before any statement
+    work, while the ledger and the query parameters are unchanged"""
+
+    def decorator(view):
+        def not_modified(request, etag):
+            headers = cache_headers(HttpResponse(), etag)
+            response = get_conditional_response(request, etag=etag, response=headers)
+            # The headers response itself comes back when the page is needed
+            return None if response is headers else response
+
+        if asyncio.iscoroutinefunction(view):
+
+            @functools.wraps(view)
+            async def async_view(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                etag = await sync_to_async(page_etag)(request, parameters)
+                response = not_modified(request, etag)
+                if response is None:
+                    response = cache_headers(await view(request, *args, **kwargs), etag)
+                return response
+
+            return async_view
+
+        @functools.wraps(view)
+        def sync_view(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            etag = page_etag(request, parameters)
+            response = not_modified(request, etag)
+            if response is None:
+                response = cache_headers(view(request, *args, **kwargs), etag)
+            return response
+
+        return sync_view
+
+    return decorator
+
+
+def render_page(request, template_name, context=None):
+    """Render the template, timed as the render stage"""
+    with stage_timing.stage("render"):
+        return render(request, template_name, context)
+
+
+@stage_timing.stage("plotly")
+def figure_div(fig):
+    """Embed the figure as a JSON spec, drawn by routines/plotly_figures.js"""
+    figure_json = fig.to_json().translate(FIGURE_JSON_ESCAPES)
+    return mark_safe(
+        '<div class="plotly-figure">'
+        f'<script type="application/json">{figure_json}</script>'
+        "</div>"
+    )
 
-    if statement_files_string is not None and len(statement_files_string.strip()) != 0:
-        statement_file = statement_files_string.split(" ")
-        files = [f for f in statement_file]
 
-    return files
+def zip_statements(archive):
+    """(name, bytes) of the statements in the zip archive, read one at a time
+
+    Each member is read up to one byte over STATEMENT_MAX_UPLOAD_SIZE, as the
+    sizes in the zip headers are not trusted.
+    """
+    with zipfile.ZipFile(archive) as zip_file:
+        for member in zip_file.infolist():
+            statement_file_name = os.path.basename(member.filename)
+            if (
+                member.is_dir()
+                or member.filename.startswith("__MACOSX/")
+                or statement_file_name.startswith(".")
+                or not statement_file_name.endswith(STATEMENT_EXTENSIONS)
+            ):
+                continue
+            with zip_file.open(member) as statement_file:
+                yield statement_file_name, statement_file.read(
+                    STATEMENT_MAX_UPLOAD_SIZE + 1
+                )
+
+
+def uploaded_statements(statement_files):
+    """(name, bytes) of the uploaded files, the statements of zips expanded"""
+    for statement_file in statement_files:
+        metrics.observe("statement_upload_bytes", statement_file.size)
+
+        if statement_file.name.endswith(".zip"):
+            yield from zip_statements(statement_file)
+        elif statement_file.size > STATEMENT_MAX_UPLOAD_SIZE:
+            yield statement_file.name, statement_file.read(
+                STATEMENT_MAX_UPLOAD_SIZE + 1
+            )
+        else:
+            yield statement_file.name, statement_file.read()
+
+
+def upload_error(context, error, **details):
+    """Flag the upload error in context"""
+    context[error] = True
+    context.update(details)
+
+
+def read_uploads(request, context):
+    """(name, bytes) of the uploaded statements, None flagging errors in context
+
+    Reading stops at the first error, so a zip of many or large members is
+    never expanded past the limits.
+    """
+    statement_files = {}
+    total_size = 0
+    try:
+        for statement_file_name, statement_data in uploaded_statements(
+            request.FILES.getlist("statement")
+        ):
+            if not statement_file_name.endswith(STATEMENT_EXTENSIONS):
+                upload_error(context, "upload_error")
+                return None
+            if len(statement_files) >= STATEMENT_MAX_FILES:
+                upload_error(
+                    context, "upload_count_error", max_upload_files=STATEMENT_MAX_FILES
+                )
+                return None
+            total_size += len(statement_data)
+            if (
+                len(statement_data) > STATEMENT_MAX_UPLOAD_SIZE
+                or total_size > STATEMENT_MAX_TOTAL_SIZE
+            ):
+                upload_error(
+                    context,
+                    "upload_size_error",
+                    max_upload_size=STATEMENT_MAX_UPLOAD_SIZE,
+                    max_total_size=STATEMENT_MAX_TOTAL_SIZE,
+                )
+                return None
+            if statement_file_name in statement_files:
+                # Statements are stored by file name, one would replace the other
+                upload_error(
+                    context,
+                    "upload_duplicate_error",
+                    duplicate_name=statement_file_name,
+                )
+                return None
+            statement_files[statement_file_name] = statement_data
+    except zipfile.BadZipFile:
+        upload_error(context, "upload_error")
+        return None
+
+    if not statement_files:
+        upload_error(context, "upload_error")
+        return None
+    return list(statement_files.items())
+
+
+def handle_upload(request, context):
+    """Queue the uploaded statements for processing, flagging errors in context"""
+    statement_files = read_uploads(request, context)
+    if statement_files is not None:
+        context["upload_job"] = upload_jobs.submit_uploads(
+            statement_namespace(request),
+            request.POST.get("bank"),
+            statement_files,
+        )
 
 
 def upload_file(request):
     """Upload file helper"""
     context = {
-        "bank_option": "Select Bank",
+        "bank_option": statement_parser.AUTO_DETECT,
         "banks": BANKS,
     }
 
     if request.method == "POST" and "bank" in request.POST:
         # Handle form submission here
-        bank = request.POST.get("bank")
-        statement_file = request.FILES.get("statement")
-        statement_file_name = statement_file.name
-
-        if not statement_file_name.endswith((".txt", ".csv", ".CSV")):
-            context["upload_error"] = True
-        else:
-            statement_file_df = statement_parser.parse_statement(bank, statement_file)
-            if statement_file_df is None:
-                context["upload_error"] = True
-            else:
-                # Convert statement_file_df to html and save to cache
-                statement_files_string = cache.get(STATEMENT_FILES)
-
-                if statement_files_string is not None:
-                    statement_files_string = (
-                        f"{statement_files_string} {statement_file_name}"
-                    )
-                else:
-                    statement_files_string = statement_file_name
-
-                cache.set(STATEMENT_FILES, statement_files_string)
-
-                cache.set(
-                    statement_file_name,
-                    statement_file_df.to_csv(),
-                )
+        handle_upload(request, context)
 
     if request.method == "POST" and "file" in request.POST:
         # Handle file deletion here
-        statement_files = cache.get(STATEMENT_FILES).split()
-
         statement_files_to_delete = request.POST.getlist("file")
-        for statement_file_name in statement_files_to_delete:
-            cache.delete(statement_file_name)
-            statement_files.remove(statement_file_name)
+        try:
+            for statement_file_name in statement_files_to_delete:
+                statement_cache.delete_statement(
+                    statement_namespace(request), statement_file_name
+                )
+        except statement_cache.NamespaceLocked:
+            context["delete_locked_error"] = True
+
+    context["statement_files"] = verify_uploads(request)
+
+    return render_page(request, "statement/upload_file.html", context)
 
-        cache.set(STATEMENT_FILES, " ".join(statement_files))
 
-    statement_files_string = cache.get(STATEMENT_FILES)
-    if statement_files_string is not None:
-        context["statement_files"] = statement_files_string.split()
+def upload_status(request, job_id):
+    """Status of a queued upload, polled by routines/upload_status.js"""
+    status = upload_jobs.job_status(statement_namespace(request), job_id)
+    if status is None:
+        return JsonResponse({"status": "unknown"}, status=404)
+    return JsonResponse(status)
 
-    return render(request, "statement/upload_file.html", context)
+
+def metrics_page(request):
+    """Metrics of all the workers in the Prometheus text format"""
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 def no_statement(request):
     """To return a page if no statement is found"""
-    return render(request, "statement/no_statement.html")
+    return render_page(request, "statement/no_statement.html")
 
 
 def help_page(request):
     """Help page: /"""
-    return render(
+    return render_page(
         request=request,
         template_name="statement/help_page.html",
     )
@@ -121,134 +340,169 @@ def help_page(request):
 
 def generate_app_password(request):
     """Help page: /"""
-    return render(
+    return render_page(
         request=request,
         template_name="statement/generate_app_password.html",
     )
 
 
-def format_statement():
-    """Use the statement to return pandas DF"""
-
-    statement_file_string = cache.get(STATEMENT_FILES)
-    bank_statement_path = statement_file_string.split()[0]
-
-    statement_csv = cache.get(bank_statement_path)
-    statement_df = pd.read_csv(
-        io.StringIO(statement_csv),
-        index_col=0,
-    )
-    statement_df["Date"] = pd.to_datetime(statement_df["Date"], format="%d-%m-%Y")
-
-    return statement_df
-
+def add_category(df):
+    """Add Ecpense category"""
+    return categorizer.categorize(df)
 
-def get_debit_statement(statement_df):
-    """Get debit from main statement"""
-    debit_df = statement_df[statement_df["Debit Amount"] != 0.0]
-    debit_df = debit_df.drop(columns="Credit Amount", axis=1)
-    return debit_df
 
+def statement_filters(request):
+    """Read the statement table filters from the query string"""
+    return {
+        "start_date": request.GET.get("start_date"),
+        "end_date": request.GET.get("end_date"),
+        "category": request.GET.get("category") or "All",
+        "credit_or_debit": request.GET.get("credit_or_debit") or "All",
+        "search": request.GET.get("search") or "",
+    }
 
-def get_credit_statement(statement_df):
-    """Get credit from main statement"""
-    credit_df = statement_df[statement_df["Credit Amount"] != 0.0]
-    credit_df = credit_df.drop(columns="Debit Amount", axis=1)
-    return credit_df
 
+def statement_columns(filters):
+    """Columns of the statement table shown with the filters"""
+    hidden_columns = ["Category Inner"]
+    if filters["credit_or_debit"] == "Debit":
+        hidden_columns.append("Credit Amount")
+    if filters["credit_or_debit"] == "Credit":
+        hidden_columns.append("Debit Amount")
 
-def add_category(df):
-    """Add Ecpense category"""
-    category = [re.split(r" |-|/", narration)[0] for narration in df["Narration"]]
-    # df["Mode"] = category
-    df.loc[:, "Mode"] = category
-
-    category_list = []
-    for narration in df["Narration"]:
-        category = narration.split()
-        if "-" in category[0]:
-            _category = category[0].split("-")
-            category_list.append(f"{_category[0]}-{_category[1][:15]}")
-
-        else:
-            category_list.append(category[0])
+    return [
+        column for column in transactions.COLUMN_FIELDS if column not in hidden_columns
+    ]
 
-    # df["Category Inner"] = category_list
-    df.loc[:, "Category Inner"] = category_list
 
-    return df
+def query_int(request, name, default):
+    """Integer query parameter, default if missing or invalid"""
+    try:
+        return max(int(request.GET.get(name, default)), 0)
+    except ValueError:
+        return default
 
 
+@conditional_page("start_date", "end_date", "category", "credit_or_debit", "search")
 def bank_statement(request):
     """Help page: /"""
 
     files = verify_uploads(request)
     if files is None:
-        return render(
+        return render_page(
             request=request,
             template_name="statement/bank_statement.html",
         )
 
-    statement_table = format_statement()
-
-    statement_table.loc[:] = add_category(statement_table)
-    dates = statement_table["Date"]
+    min_date, max_date, categories = transactions.ledger_bounds(
+        statement_namespace(request)
+    )
 
-    credit_or_debit_option = "All"
     credit_or_debit = [
         "All",
         "Credit",
         "Debit",
     ]
 
-    expense_type = sorted(list(set(statement_table["Category Inner"])))
-    expense_type.insert(0, "All")
-    start_date_option = request.GET.get("start_date")
-    end_date_option = request.GET.get("end_date")
-    expense_type_option = request.GET.get("category")
-    credit_or_debit_option = request.GET.get("credit_or_debit")
-
-    if expense_type_option is None:
-        expense_type_option = "All"
-    if credit_or_debit_option is None:
-        credit_or_debit_option = "All"
-
-    mask = pd.Series(
-        True, index=statement_table.index
-    )  # initialize with all rows selected
-    if expense_type_option != "All":
-        mask = mask & (statement_table["Category Inner"] == expense_type_option)
-    if start_date_option:
-        mask = mask & (statement_table["Date"] >= start_date_option)
-    if end_date_option:
-        mask = mask & (statement_table["Date"] <= end_date_option)
-    if credit_or_debit_option == "Debit":
-        statement_table = statement_table.drop(["Credit Amount"], axis=1)
-        mask = mask & (statement_table["Debit Amount"] > 0.0)
-    if credit_or_debit_option == "Credit":
-        statement_table = statement_table.drop(["Debit Amount"], axis=1)
-        mask = mask & (statement_table["Credit Amount"] > 0.0)
-
-    statement_table = statement_table[mask]
-    statement_table = statement_table.drop(["Category Inner"], axis=1)
-
-    statement_table_html = statement_table.to_html()
-
-    return render(
+    expense_type = ["All", *categories]
+    filters = statement_filters(request)
+
+    return render_page(
         request=request,
         template_name="statement/bank_statement.html",
         context={
-            "statement_table": statement_table_html,
-            "min_date": str(dates[0]).split()[0],
-            "max_date": str(dates[len(dates) - 1]).split()[0],
-            "expense_type_option": expense_type_option,
-            "credit_or_debit_option": credit_or_debit_option,
+            "min_date": str(min_date),
+            "max_date": str(max_date),
+            "expense_type_option": filters["category"],
+            "credit_or_debit_option": filters["credit_or_debit"],
+            "search_option": filters["search"],
             "credit_or_debit": credit_or_debit,
             "expense_type": expense_type,
+            "page_size": STATEMENT_PAGE_SIZE,
+            "export_formats": exporters.available_formats(),
+            "export_query": export_query(request),
         },
     )
 
 
+def export_query(request):
+    """Query string of the statement filters, for the export links"""
+    query = request.GET.copy()
+    for name in ("format", "report", "offset", "limit"):
+        query.pop(name, None)
+    return query.urlencode()
+
+
+def bank_statement_export(request):
+    """Stream the filtered transactions, or their monthly report, as a file"""
+    export_format = request.GET.get("format") or "csv"
+    if export_format not in exporters.available_formats():
+        return JsonResponse(
+            {"error": f"Export format {export_format!r} is not available"}, status=400
+        )
+
+    namespace = statement_namespace(request)
+    filters = statement_filters(request)
+    if request.GET.get("report") == "monthly":
+        file_name = "monthly_report"
+        columns, rows = transactions.export_monthly_report(namespace, filters)
+    else:
+        file_name = "transactions"
+        queryset = transactions.filter_transactions(namespace, filters)
+        sort = request.GET.get("sort")
+        if sort in transactions.COLUMN_FIELDS:
+            queryset = transactions.sort_transactions(
+                queryset, sort, request.GET.get("order") != "desc"
+            )
+        columns, rows = transactions.export_transactions(queryset)
+
+    content_type, chunks = exporters.export(export_format, columns, rows)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="{file_name}.{export_format}"'
+    )
+    return response
+
+
+def bank_statement_rows(request):
+    """One page of the filtered statement table as JSON"""
+    page = {
+        "total": 0,
+        "offset": query_int(request, "offset", 0),
+        "limit": min(
+            query_int(request, "limit", STATEMENT_PAGE_SIZE), STATEMENT_MAX_PAGE_SIZE
+        ),
+        "columns": [],
+        "rows": [],
+    }
+
+    files = verify_uploads(request)
+    if files is None:
+        return JsonResponse(page)
+
+    filters = statement_filters(request)
+    columns = statement_columns(filters)
+    queryset = transactions.filter_transactions(statement_namespace(request), filters)
+
+    sort = request.GET.get("sort")
+    if sort in columns:
+        queryset = transactions.sort_transactions(
+            queryset, sort, request.GET.get("order") != "desc"
+        )
+
+    statement_page = transactions.transactions_frame(
+        queryset[page["offset"] : page["offset"] + page["limit"]], columns
+    )
+    statement_page["Date"] = statement_page["Date"].dt.strftime("%Y-%m-%d")
+    statement_page = statement_page.rename_axis("#").reset_index()
+    statement_page = json.loads(statement_page.to_json(orient="split", index=False))
+
+    page["total"] = queryset.count()
+    page["columns"] = statement_page["columns"]
+    page["rows"] = statement_page["data"]
+    return JsonResponse(page)
+
+
 def generate_bargraph(credit_by_month, debit_by_month):
     """Returns a graph object"""
     # create a side by side bar plot
@@ -288,46 +542,42 @@ def generate_bargraph(credit_by_month, debit_by_month):
     return fig
 
 
-def statement_as_bar(statement_df):
+def cube_month_labels(cube):
+    """Labels of all the months of the cube, as shown in the month dropdown"""
+    return [aggregates.month_label(month) for month in aggregates.cube_months(cube)]
+
+
+def statement_as_bar(content_hash, cube):
     """To view the Graphs and Bargraphs"""
 
-    # generate the plot
-    statement_df.set_index("Date", inplace=True)
-
-    debit_df = statement_df[statement_df["Debit Amount"] != 0.0]
-    debit_df = debit_df.drop(columns="Credit Amount", axis=1)
-    credit_df = statement_df[statement_df["Credit Amount"] != 0.0]
-    credit_df = credit_df.drop(columns="Debit Amount", axis=1)
-
-    aggregare_debit = {}
-    months = []
-    monthly_debit = debit_df.resample("M")
-    for name, data in monthly_debit:
-        months.append(f"{name.strftime('%b')} {name.year}")
-        aggregare_debit[name] = data["Debit Amount"].sum()
-
-    monthly_credit = credit_df.resample("M")
-    aggregare_credit = {}
-    for name, data in monthly_credit:
-        aggregare_credit[name] = data["Credit Amount"].sum()
-
-    fig = generate_bargraph(aggregare_credit, aggregare_debit)
-    # plot_html = fig.to_html(full_html=False, include_plotlyjs=False)
-    plot_html = opy.plot(fig, auto_open=False, output_type="div")
+    # generate the plot from the monthly totals of the cube
+    months = aggregates.cube_months(cube)
+    month_ends = months.to_timestamp(how="end").normalize()
+
+    aggregare_debit = dict(
+        zip(month_ends, aggregates.monthly_totals(cube, "Debit", months))
+    )
+    aggregare_credit = dict(
+        zip(month_ends, aggregates.monthly_totals(cube, "Credit", months))
+    )
+
+    def build_bargraph():
+        return figure_div(generate_bargraph(aggregare_credit, aggregare_debit))
+
     # pass the HTML to the template
-    return {"plot_html": plot_html}, months
+    return statement_cache.cached_chart(content_hash, ("bargraph",), build_bargraph)
 
 
 def debit_pie(last_month_debit, detailed_view):
     """To returnt he debit pie chart for a month"""
     if detailed_view:
-        last_month_debit_group = last_month_debit.groupby("Category Inner")
+        level = "Category Inner"
     else:
-        last_month_debit_group = last_month_debit.groupby("Mode")
+        level = "Mode"
 
-    debit_category_dict = {}
-    for name, category in last_month_debit_group:
-        debit_category_dict[name] = category["Debit Amount"].sum()
+    debit_category_dict = (
+        last_month_debit["Amount"].groupby(level=level).sum().to_dict()
+    )
 
     labels = list([f"{key}: Rs.{value}" for key, value in debit_category_dict.items()])
     values = list(debit_category_dict.values())
@@ -341,7 +591,7 @@ def debit_pie(last_month_debit, detailed_view):
         width=700,  # specify width in pixels
         height=700,  # specify height in pixels
     )
-    plot_html = opy.plot(fig, auto_open=False, output_type="div")
+    plot_html = figure_div(fig)
     # Display the chart
     return plot_html
 
@@ -349,13 +599,13 @@ def debit_pie(last_month_debit, detailed_view):
 def credit_pie(last_month_credit, detailed_view):
     """To returnt he credit pie chart for a month"""
     if detailed_view:
-        last_month_credit_group = last_month_credit.groupby("Category Inner")
+        level = "Category Inner"
     else:
-        last_month_credit_group = last_month_credit.groupby("Mode")
+        level = "Mode"
 
-    credit_category_dict = {}
-    for name, category in last_month_credit_group:
-        credit_category_dict[name] = category["Credit Amount"].sum()
+    credit_category_dict = (
+        last_month_credit["Amount"].groupby(level=level).sum().to_dict()
+    )
 
     labels = list([f"{key}: Rs.{value}" for key, value in credit_category_dict.items()])
     values = list(credit_category_dict.values())
@@ -369,93 +619,32 @@ def credit_pie(last_month_credit, detailed_view):
         width=700,  # specify width in pixels
         height=700,  # specify height in pixels
     )
-    plot_html = opy.plot(fig, auto_open=False, output_type="div")
+    plot_html = figure_div(fig)
     # Display the chart
     return plot_html
 
 
-def statement_as_pichart(statement_df, month, detailed_view):
-    """Handler for Months statement PieChart"""
-    category = [
-        re.split(r" |-|/", narration)[0] for narration in statement_df["Narration"]
-    ]
-
-    # df["Mode"] = category
-    statement_df.loc[:, "Mode"] = category
-
-    category_list = []
-    for narration in statement_df["Narration"]:
-        category = narration.split()
-        if "-" in category[0]:
-            _category = category[0].split("-")
-            category_list.append(f"{_category[0]}-{_category[1][:15]}")
-        else:
-            category_list.append(category[0])
-
-    statement_df.loc[:, "Category Inner"] = category_list
-
-    debit_df = statement_df[statement_df["Debit Amount"] != 0.0]
-    debit_df = debit_df.drop(columns="Credit Amount", axis=1)
-    credit_df = statement_df[statement_df["Credit Amount"] != 0.0]
-    credit_df = credit_df.drop(columns="Debit Amount", axis=1)
-
-    last_month_debit = None
-    monthly_debit = debit_df.resample("M")
-    for name, data in monthly_debit:
-        if month == f"{name.strftime('%b')} {name.year}":
-            last_month_debit = data.copy()
-            break
-    last_month_debit.loc[:] = add_category(last_month_debit)
-
-    last_month_credit = None
-    monthly_credit = credit_df.resample("M")
-    for name, data in monthly_credit:
-        if month == f"{name.strftime('%b')} {name.year}":
-            last_month_credit = data.copy()
-            break
-    last_month_credit.loc[:] = add_category(last_month_credit)
+def statement_as_pichart(content_hash, cube, month, detailed_view, direction):
+    """Handler for the Credit or Debit PieChart of a month"""
+    month_slice = aggregates.month_slice(cube, aggregates.parse_month(month), direction)
+    build_pie = credit_pie if direction == "Credit" else debit_pie
 
-    context = {}
-    context["credit_pie"] = credit_pie(last_month_credit, detailed_view)
-    context["debit_pie"] = debit_pie(last_month_debit, detailed_view)
-
-    return context
+    return statement_cache.cached_chart(
+        content_hash,
+        (f"{direction.lower()}_pie", month, detailed_view),
+        lambda: build_pie(month_slice, detailed_view),
+    )
 
 
-def starting_page(request):
+@conditional_page("month", "detailed_view")
+async def starting_page(request):
     """Starting page: /"""
     context = {}
     if request.method == "POST" and "bank" in request.POST:
         # Handle form submission here
-        bank = request.POST.get("bank")
-        statement_file = request.FILES.get("statement")
-        statement_file_name = statement_file.name
+        await sync_to_async(handle_upload)(request, context)
 
-        if not statement_file_name.endswith((".txt", ".csv", ".CSV")):
-            context["upload_error"] = True
-        else:
-            statement_file_df = statement_parser.parse_statement(bank, statement_file)
-            if statement_file_df is None:
-                context["upload_error"] = True
-            else:
-                # Convert statement_file_df to html and save to cache
-                statement_files_string = cache.get(STATEMENT_FILES)
-
-                if statement_files_string is not None:
-                    statement_files_string = (
-                        f"{statement_files_string} {statement_file_name}"
-                    )
-                else:
-                    statement_files_string = statement_file_name
-
-                cache.set(STATEMENT_FILES, statement_files_string)
-
-                cache.set(
-                    statement_file_name,
-                    statement_file_df.to_csv(),
-                )
-
-    files = verify_uploads(request)
+    files = await sync_to_async(verify_uploads)(request)
 
     if files is None:
         images = []
@@ -466,24 +655,23 @@ def starting_page(request):
                     "name": image,
                 }
             )
-        context = {
-            "bank_option": "Select Bank",
-            "banks": BANKS,
-            "images": images,
-        }
-
-        statement_files_string = cache.get(STATEMENT_FILES)
-        if statement_files_string is not None:
-            context["statement_files"] = statement_files_string.split()
+        context.update(
+            {
+                "bank_option": statement_parser.AUTO_DETECT,
+                "banks": BANKS,
+                "images": images,
+            }
+        )
 
-        return render(
+        return await sync_to_async(render_page)(
             request=request,
             template_name="statement/no_statement.html",
             context=context,
         )
 
-    statement_df = format_statement()
-    context, months = statement_as_bar(statement_df)
+    namespace = await sync_to_async(statement_namespace)(request)
+    cube = await sync_to_async(statement_cache.load_cube)(namespace)
+    months = cube_month_labels(cube)
     month_option = request.GET.get("month")
 
     detailed_view = BooleanForm()
@@ -493,15 +681,29 @@ def starting_page(request):
         detailed_view = bool(request.GET.get("detailed_view"))
         context["detailed_view"] = detailed_view
 
-    if month_option is None:
-        month_option = months[-1]
+    if month_option not in months:
+        month_option = months[-1] if months else None
     context["months"] = months
     context["month_option"] = month_option
+    context["plotly_js_version"] = PLOTLY_JS_VERSION
     context["detailed_view"] = detailed_view
-    pie_context = statement_as_pichart(statement_df, month_option, detailed_view)
-    context.update(pie_context)
 
-    return render(
+    # The charts are independent, build them concurrently. The threads only
+    # run pandas and plotly, the database and caches are read here
+    content_hash = await sync_to_async(statement_cache.charts_hash)(namespace)
+    await asyncio.to_thread(load_plotly)
+    pie_args = (content_hash, cube, month_option, bool(detailed_view))
+    (
+        context["plot_html"],
+        context["credit_pie"],
+        context["debit_pie"],
+    ) = await asyncio.gather(
+        asyncio.to_thread(statement_as_bar, content_hash, cube),
+        asyncio.to_thread(statement_as_pichart, *pie_args, "Credit"),
+        asyncio.to_thread(statement_as_pichart, *pie_args, "Debit"),
+    )
+
+    return await sync_to_async(render_page)(
         request=request,
         template_name="statement/starting_page.html",
         context=context,